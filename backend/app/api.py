@@ -1,24 +1,120 @@
 import os
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
-from typing import List
+import json
+import uuid
+import hashlib
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Header
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 
-from .services import create_final_document, ask_clarifying_questions, export_to_pptx
-from .models import GenerateRequest, GenerateResponse, ClarifyRequest, ClarifyResponse
+from .services import response_cache, create_stored_document, regenerate_document, check_generated, GenerationUnavailable, ask_clarifying_questions, export_to_pptx, ingest_document, iter_document_sections, assemble_document
+from . import parse_cache
+from . import artifacts
+from . import services
+from . import document_store
+from . import jobs
+from . import rendering
+from . import metrics
+from . import profiling
+from .models import GenerateRequest, GenerateResponse, SectionUsage, ClarifyRequest, ClarifyResponse, ExportRequest, JobRequest, RegenerateRequest
 
 router = APIRouter()
 UPLOAD_DIRECTORY = "uploads"
+# Partial uploads live here until complete; it is a subdirectory so /files never lists them.
+UPLOAD_TEMP_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".incoming")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_FILE_BYTES = int(os.environ.get("MAX_UPLOAD_FILE_BYTES", 200 * 1024 * 1024))
+MAX_UPLOAD_REQUEST_BYTES = int(os.environ.get("MAX_UPLOAD_REQUEST_BYTES", 500 * 1024 * 1024))
+# Allowance for multipart boundaries and part headers on top of the file bytes.
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
 
 # Ensure the upload directory exists
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+os.makedirs(UPLOAD_TEMP_DIRECTORY, exist_ok=True)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects oversized uploads from their Content-Length header, before the
+    multipart body is received and spooled to disk. Upload requests without a
+    Content-Length are refused, since their size cannot be checked up front.
+    _save_upload still enforces the per-file limit on the actual bytes.
+    """
+
+    def __init__(self, app, path: str = "/api/upload"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope["headers"])
+        try:
+            content_length = int(headers[b"content-length"])
+        except (KeyError, ValueError):
+            response = JSONResponse({"detail": "Uploads require a Content-Length header"}, status_code=411)
+        else:
+            if content_length <= MAX_UPLOAD_REQUEST_BYTES + UPLOAD_MULTIPART_OVERHEAD:
+                await self.app(scope, receive, send)
+                return
+            response = JSONResponse(
+                {"detail": f"Upload too large: {content_length} bytes. The limit is {MAX_UPLOAD_REQUEST_BYTES} bytes per request"},
+                status_code=413
+            )
+        await response(scope, receive, send)
+
+
+def _write_chunk(buffer, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+async def _save_upload(file: UploadFile, file_path: str, request_budget: int) -> int:
+    """
+    Streams an upload to disk in fixed-size chunks, hashing it in the same pass.
+    The data goes to a temporary name and is atomically renamed into place once
+    complete, so peak memory is one chunk and readers never see a partial file.
+    Hashing and disk writes run in the threadpool so large uploads never block the event loop.
+    Returns the number of bytes written.
+    """
+    limit = min(MAX_UPLOAD_FILE_BYTES, request_budget)
+    tmp_path = os.path.join(UPLOAD_TEMP_DIRECTORY, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large: {file.filename}. Limits are {MAX_UPLOAD_FILE_BYTES} bytes per file and {MAX_UPLOAD_REQUEST_BYTES} bytes per request"
+                    )
+                await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    await run_in_threadpool(parse_cache.remember_hash, file_path, digest.hexdigest())
+    return size
 
 @router.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
+async def upload_files(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...)):
     """
     Handles file uploads. Saves files to the 'uploads' directory.
     Supports PDF, DOCX, XLSX, XLS, PPTX files.
+    Files are streamed to disk, bounded by MAX_UPLOAD_FILE_BYTES and MAX_UPLOAD_REQUEST_BYTES.
+    Each file then goes through the ingest pipeline in the background; GET /files
+    reports its ingest status.
     """
     filenames = []
+    request_budget = MAX_UPLOAD_REQUEST_BYTES
     supported_extensions = ['.pdf', '.docx', '.xlsx', '.xls', '.pptx', '.txt']
     
     for file in files:
@@ -30,41 +126,136 @@ async def upload_files(files: List[UploadFile] = File(...)):
                 detail=f"Unsupported file type: {file.filename}. Supported types: {', '.join(supported_extensions)}"
             )
         
-        file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
+        filename = os.path.basename(file.filename)
+        file_path = os.path.join(UPLOAD_DIRECTORY, filename)
         try:
-            with open(file_path, "wb") as buffer:
-                buffer.write(await file.read())
-            filenames.append(file.filename)
+            request_budget -= await _save_upload(file, file_path, request_budget)
+            filenames.append(filename)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Could not save file: {file.filename}. Error: {e}")
+    
+    for filename in filenames:
+        artifacts.set_file_status(filename, artifacts.PENDING)
+        background_tasks.add_task(ingest_document, filename)
             
     return JSONResponse(content={"filenames": filenames, "message": f"Successfully uploaded {len(filenames)} files"}, status_code=200)
 
 
 @router.post("/generate", response_model=GenerateResponse)
-async def generate_document_endpoint(request: GenerateRequest):
+async def generate_document_endpoint(request: GenerateRequest, timings: bool = False, profile: bool = False, x_profile: Optional[str] = Header(None)):
     """
     Enhanced endpoint to generate the document with tone and style support.
+    Generation runs in the threadpool so the event loop stays responsive.
+    The report is stored and its document_id returned for later export.
+    With ?timings=true the response includes a per-stage timing breakdown.
+    With ?profile=true or an "X-Profile: 1" header the request is run under
+    cProfile and the response links to the stored profile.
+    Sections that fell back to demo content are flagged in usage; if every
+    section did, nothing is stored and the endpoint returns 503.
     """
     try:
-        final_document = create_final_document(
-            template=request.template, 
-            filenames=request.filenames,
-            tone=request.tone,
-            style=request.style
+        with metrics.collect_request() as request_timings, profiling.profile_request(profiling.is_requested(profile, x_profile)) as request_profile:
+            record = await run_in_threadpool(
+                profiling.run,
+                create_stored_document,
+                template=request.template, 
+                filenames=request.filenames,
+                tone=request.tone,
+                style=request.style,
+                mode=request.mode,
+                batch_sections=request.batch_sections
+            )
+        return GenerateResponse(
+            document=record["document"],
+            document_id=record["id"],
+            usage=_section_usage(record["sections"]),
+            timings=request_timings.summary() if timings else None,
+            profile=await run_in_threadpool(request_profile.save) if request_profile else None
         )
-        return GenerateResponse(document=final_document)
+    except GenerationUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate document. Error: {e}")
 
 
+def _section_usage(sections: list[dict]) -> List[SectionUsage]:
+    """
+    Extracts per-section token counts from generated sections.
+    """
+    return [
+        SectionUsage(
+            index=section["index"],
+            title=section["title"],
+            prompt_tokens=section.get("prompt_tokens", 0),
+            completion_tokens=section.get("completion_tokens", 0),
+            demo_fallback=section.get("demo_fallback", False)
+        )
+        for section in sections
+    ]
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """
+    Formats a single server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/generate/stream")
+async def generate_document_stream_endpoint(request: GenerateRequest):
+    """
+    Streams the document as server-sent events.
+    Emits 'start' with the section count, one 'section' event per completed
+    section (carrying its template index and demo_fallback flag), then 'done'
+    with the assembled document, the document_id it was stored under and the
+    indices of any demo_sections. If every section fell back to demo content
+    an 'error' event is sent instead and nothing is stored.
+    """
+    def event_stream():
+        yield _sse_event("start", {"total": len(request.template)})
+        sections = []
+        try:
+            for section in iter_document_sections(
+                template=request.template,
+                filenames=request.filenames,
+                tone=request.tone,
+                style=request.style,
+                mode=request.mode,
+                batch_sections=request.batch_sections
+            ):
+                sections.append(section)
+                yield _sse_event("section", section)
+            demo_sections = check_generated(sections)
+            document = assemble_document(sections)
+            record = document_store.save_document(
+                request.template, request.filenames, request.tone, request.style, sections, document, request.mode or "retrieval"
+            )
+            yield _sse_event("done", {"document": document, "document_id": record["id"], "demo_sections": demo_sections})
+        except GenerationUnavailable as e:
+            yield _sse_event("error", {"detail": str(e), "status": 503})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Failed to generate document. Error: {e}"})
+    
+    # Starlette iterates sync generators in its threadpool, so the event loop never blocks.
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/clarify", response_model=ClarifyResponse)
 async def get_clarifying_questions(request: ClarifyRequest):
     """
     AI-powered endpoint to generate clarifying questions based on template and files.
     """
     try:
-        questions = ask_clarifying_questions(
+        questions = await run_in_threadpool(
+            ask_clarifying_questions,
             template=request.template,
             filenames=request.filenames
         )
@@ -76,7 +267,7 @@ async def get_clarifying_questions(request: ClarifyRequest):
 @router.get("/files")
 async def list_uploaded_files():
     """
-    Lists all currently uploaded files.
+    Lists all currently uploaded files with their ingest status.
     """
     try:
         files = []
@@ -88,13 +279,35 @@ async def list_uploaded_files():
                     files.append({
                         "name": filename,
                         "size": file_size,
-                        "type": os.path.splitext(filename)[1].lower()
+                        "type": os.path.splitext(filename)[1].lower(),
+                        **_ingest_info(filename)
                     })
         return JSONResponse(content={"files": files}, status_code=200)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list files. Error: {e}")
 
 
+def _ingest_info(filename: str) -> dict:
+    """
+    Summarises a file's ingest status and, once ready, its artifact counts.
+    """
+    record = artifacts.get_file_record(filename)
+    if record is None:
+        return {"ingest_status": None}
+    info = {"ingest_status": record["status"]}
+    if record["status"] == artifacts.FAILED:
+        info["ingest_error"] = record["error"]
+    elif record["status"] == artifacts.READY:
+        meta = artifacts.load_meta(record["content_hash"], services.ARTIFACT_VERSION)
+        if meta is not None:
+            info.update({
+                "page_count": meta["page_count"],
+                "chunk_count": meta["chunk_count"],
+                "token_count": meta["token_count"]
+            })
+    return info
+
+
 @router.delete("/files/{filename}")
 async def delete_file(filename: str):
     """
@@ -103,7 +316,7 @@ async def delete_file(filename: str):
     try:
         file_path = os.path.join(UPLOAD_DIRECTORY, filename)
         if os.path.exists(file_path):
-            os.remove(file_path)
+            await run_in_threadpool(_remove_upload, file_path)
             return JSONResponse(content={"message": f"File {filename} deleted successfully"}, status_code=200)
         else:
             raise HTTPException(status_code=404, detail=f"File {filename} not found")
@@ -111,53 +324,339 @@ async def delete_file(filename: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete file. Error: {e}")
 
 
+def _remove_upload(file_path: str) -> None:
+    """
+    Deletes an upload and its ingest record. The parse cache and artifacts are
+    keyed by content, so they are only dropped when no other upload has the same bytes.
+    """
+    content_hash = parse_cache.file_hash(file_path)
+    if not _content_shared(file_path, content_hash):
+        parse_cache.invalidate(content_hash)
+        artifacts.remove_artifacts(content_hash)
+    artifacts.remove_file_record(os.path.basename(file_path))
+    os.remove(file_path)
+
+
+def _content_shared(file_path: str, content_hash: str) -> bool:
+    """
+    Whether another upload has the same content. Only files of the same size are hashed.
+    """
+    size = os.path.getsize(file_path)
+    for entry in os.scandir(UPLOAD_DIRECTORY):
+        if not entry.is_file() or entry.name == os.path.basename(file_path):
+            continue
+        try:
+            if entry.stat().st_size == size and parse_cache.file_hash(entry.path) == content_hash:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def _media_type(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    for _, renderer_extension, media_type in rendering.RENDERERS.values():
+        if renderer_extension == extension:
+            return media_type
+    return "application/octet-stream"
+
+
+def _export_response(export_path: str, content: dict, stream: bool):
+    """
+    Returns the download URL as JSON, or with stream=true the file itself as the body.
+    """
+    filename = os.path.basename(export_path)
+    if stream:
+        return FileResponse(path=export_path, filename=filename, media_type=_media_type(filename))
+    return JSONResponse(content={
+        **content,
+        "filename": filename,
+        "download_url": f"/api/download/{filename}"
+    }, status_code=200)
+
+
 @router.post("/export/pptx")
-async def export_document_to_pptx(request: GenerateRequest):
+async def export_document_to_pptx(request: GenerateRequest, stream: bool = False, timings: bool = False, profile: bool = False, x_profile: Optional[str] = Header(None)):
     """
     Exports the generated document to PowerPoint format and returns download URL.
+    With ?stream=true the presentation is returned as the response body instead.
+    With ?timings=true the JSON response includes a per-stage timing breakdown.
+    With ?profile=true or an "X-Profile: 1" header generation and export run
+    under cProfile; the JSON response links to the profile, and a streamed
+    response carries its ID in the X-Profile-Id header.
+    Prefer POST /export with a document_id when the document already exists.
     """
     try:
-        # First generate the document
-        document_content = create_final_document(
-            template=request.template, 
-            filenames=request.filenames,
-            tone=request.tone,
-            style=request.style
-        )
-        
-        # Then export to PPTX
-        pptx_path = export_to_pptx(document_content, "generated_report")
-        filename = os.path.basename(pptx_path)
+        with metrics.collect_request() as request_timings, profiling.profile_request(profiling.is_requested(profile, x_profile)) as request_profile:
+            # First generate (and store) the document
+            record = await run_in_threadpool(
+                profiling.run,
+                create_stored_document,
+                template=request.template, 
+                filenames=request.filenames,
+                tone=request.tone,
+                style=request.style,
+                mode=request.mode,
+                batch_sections=request.batch_sections
+            )
+            
+            # Then export to PPTX, named after the document so concurrent exports never collide
+            pptx_path = await run_in_threadpool(profiling.run, export_to_pptx, record["document"], f"report_{record['id']}")
         
-        return JSONResponse(content={
+        content = {
             "message": "PowerPoint presentation generated successfully",
-            "filename": filename,
-            "download_url": f"/api/download/{filename}"
-        }, status_code=200)
+            "document_id": record["id"]
+        }
+        if timings:
+            content["timings"] = request_timings.summary()
+        if request_profile:
+            content["profile"] = await run_in_threadpool(request_profile.save)
+        response = _export_response(pptx_path, content, stream)
+        if stream and content.get("profile"):
+            response.headers["X-Profile-Id"] = content["profile"]["id"]
+        return response
         
+    except GenerationUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export to PowerPoint. Error: {e}")
 
 
+@router.get("/documents/{document_id}", response_model=GenerateResponse)
+async def get_document(document_id: str):
+    """
+    Returns a previously generated document.
+    """
+    record = document_store.load_document(document_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return GenerateResponse(document=record["document"], document_id=record["id"], usage=_section_usage(record["sections"]))
+
+
+@router.post("/documents/{document_id}/regenerate", response_model=GenerateResponse)
+async def regenerate_document_endpoint(document_id: str, request: RegenerateRequest, timings: bool = False):
+    """
+    Regenerates a stored document with an edited template, sources, tone or style.
+    Only sections whose inputs changed are sent to the model; the rest are
+    reused. The result is stored under a new document_id.
+    """
+    try:
+        with metrics.collect_request() as request_timings:
+            record = await run_in_threadpool(
+                regenerate_document,
+                document_id,
+                template=request.template,
+                filenames=request.filenames,
+                tone=request.tone,
+                style=request.style,
+                mode=request.mode
+            )
+    except GenerationUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to regenerate document. Error: {e}")
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return GenerateResponse(
+        document=record["document"],
+        document_id=record["id"],
+        usage=_section_usage(record["sections"]),
+        timings=request_timings.summary() if timings else None,
+        regenerated_sections=record["regenerated"],
+        reused_sections=record["reused"]
+    )
+
+
+@router.post("/export")
+async def export_existing_document(request: ExportRequest, stream: bool = False, timings: bool = False):
+    """
+    Exports an already generated document without regenerating it, to one or
+    more of PPTX, DOCX and PDF. The markdown is parsed once for all formats.
+    Accepts the document_id returned by /generate, or the markdown body directly.
+    Exports of stored documents are cached per document ID and format.
+    With ?stream=true (one format only) the file is returned as the response body.
+    With ?timings=true the JSON response includes the render timings.
+    """
+    formats = request.formats or ["pptx"]
+    unsupported = [fmt for fmt in formats if fmt not in rendering.RENDERERS]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {', '.join(unsupported)}. Supported formats: {', '.join(rendering.EXPORT_FORMATS)}")
+    if stream and len(formats) != 1:
+        raise HTTPException(status_code=400, detail="stream=true requires exactly one format")
+    
+    if request.document_id:
+        record = document_store.load_document(request.document_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Document {request.document_id} not found")
+        document_content = record["document"]
+        output_name = f"report_{record['id']}"
+    elif request.document:
+        document_content = request.document
+        output_name = f"report_{uuid.uuid4().hex}"
+    else:
+        raise HTTPException(status_code=400, detail="Provide either document_id or document")
+    
+    try:
+        with metrics.collect_request() as request_timings:
+            paths = await run_in_threadpool(
+                services.export_document, document_content, formats, output_name, reuse=bool(request.document_id)
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export document. Error: {e}")
+    
+    exports = {
+        fmt: {"filename": os.path.basename(path), "download_url": f"/api/download/{os.path.basename(path)}"}
+        for fmt, path in paths.items()
+    }
+    content = {
+        "message": f"Exported document to {', '.join(formats)}",
+        "exports": exports
+    }
+    if timings:
+        content["timings"] = request_timings.summary()
+    return _export_response(paths[formats[0]], content, stream)
+
+
+@router.get("/documents/{document_id}/export/{export_format}")
+async def download_document_export(document_id: str, export_format: str):
+    """
+    Streams a stored document rendered to the given format (pptx, docx or pdf),
+    rendering it on first request and serving the cached file afterwards.
+    """
+    if export_format not in rendering.RENDERERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}. Supported formats: {', '.join(rendering.EXPORT_FORMATS)}")
+    record = document_store.load_document(document_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    
+    try:
+        paths = await run_in_threadpool(
+            services.export_document, record["document"], [export_format], f"report_{record['id']}", reuse=True
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export document. Error: {e}")
+    return _export_response(paths[export_format], {}, stream=True)
+
+
+@router.get("/profiles/{filename}")
+async def download_profile(filename: str):
+    """
+    Downloads a stored request profile: <id>.prof (pstats data) or <id>.txt (summary).
+    """
+    path = profiling.profile_path(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {filename} not found")
+    media_type = "text/plain" if filename.endswith(".txt") else "application/octet-stream"
+    return FileResponse(path=path, filename=filename, media_type=media_type)
+
+
 @router.get("/download/{filename}")
 async def download_file(filename: str):
     """
-    Downloads a generated file.
+    Downloads a generated export.
     """
     try:
-        file_path = os.path.join(UPLOAD_DIRECTORY, filename)
+        file_path = os.path.join(services.EXPORT_DIRECTORY, os.path.basename(filename))
         if os.path.exists(file_path):
             return FileResponse(
                 path=file_path,
                 filename=filename,
-                media_type='application/vnd.openxmlformats-officedocument.presentationml.presentation'
+                media_type=_media_type(filename)
             )
         else:
             raise HTTPException(status_code=404, detail=f"File {filename} not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to download file. Error: {e}")
 
 
+@router.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Queues a report generation (or generation + PPTX export) job and returns its ID.
+    Poll GET /jobs/{job_id} for progress instead of holding the request open.
+    """
+    try:
+        job = await run_in_threadpool(
+            jobs.submit_job,
+            request.kind,
+            {"template": request.template, "filenames": request.filenames, "tone": request.tone, "style": request.style, "mode": request.mode, "batch_sections": request.batch_sections}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=job, status_code=202)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Returns a job's status and progress (sections completed / total).
+    """
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job, status_code=200)
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Returns the finished job's document, plus the download URL for export jobs.
+    """
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] != jobs.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    
+    record = document_store.load_document(job["result"]["document_id"])
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Document for job {job_id} no longer exists")
+    return JSONResponse(content={**job["result"], "document": record["document"]}, status_code=200)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancels a queued or running job.
+    """
+    job = await run_in_threadpool(jobs.cancel_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job, status_code=200)
+
+
+@router.get("/cache/stats")
+async def llm_cache_stats():
+    """
+    Reports LLM response cache hit/miss counters.
+    """
+    if response_cache is None:
+        return JSONResponse(content={"enabled": False}, status_code=200)
+    return JSONResponse(content={"enabled": True, **response_cache.stats()}, status_code=200)
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """
+    Pipeline metrics in the Prometheus text exposition format: per-file parse
+    time, per-section and per-call LLM latency, tokens in/out, cache hits and
+    export time, plus LLM client and response cache counters.
+    """
+    gauges = {f"llm_client_{name}": value for name, value in services.client.stats().items()}
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        gauges.update({
+            "llm_cache_lookups_hits": cache_stats["hits"],
+            "llm_cache_lookups_misses": cache_stats["misses"],
+            "llm_cache_hit_rate": cache_stats["hit_rate"],
+        })
+    return PlainTextResponse(metrics.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/health")
 async def health_check():
     """
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import threading
+
+# --- Configuration ---
+# Per-document artifacts produced by the upload-time ingest pipeline live beside
+# uploads/. Content artifacts are keyed by file hash and pipeline version:
+#   <hash>.<version>.meta.json    page/unit/token counts and a short summary
+#   <hash>.<version>.chunks.jsonl retrieval chunks with their token counts
+# Ingest status is tracked per uploaded filename in files/<filename>.json.
+# The parsed text itself is kept in the parse cache.
+# Content artifacts are bounded like the parse cache: least recently used sets
+# are evicted once they exceed ARTIFACT_MAX_BYTES (PARSE_CACHE_MAX_BYTES by default).
+ARTIFACT_DIRECTORY = "artifacts"
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", os.environ.get("PARSE_CACHE_MAX_BYTES", 512 * 1024 * 1024)))
+_FILES_DIRECTORY = os.path.join(ARTIFACT_DIRECTORY, "files")
+_CONTENT_SUFFIXES = (".meta.json", ".chunks.jsonl")
+
+PENDING = "pending"
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+os.makedirs(_FILES_DIRECTORY, exist_ok=True)
+
+_lock = threading.Lock()
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _content_path(content_hash: str, version: str, suffix: str) -> str:
+    return os.path.join(ARTIFACT_DIRECTORY, f"{content_hash}.{version}.{suffix}")
+
+
+def _file_record_path(filename: str) -> str:
+    return os.path.join(_FILES_DIRECTORY, f"{os.path.basename(filename)}.json")
+
+
+def set_file_status(filename: str, status: str, content_hash: str = None, error: str = None) -> None:
+    """
+    Records the ingest status of an uploaded file.
+    """
+    with _lock:
+        _write_json(_file_record_path(filename), {
+            "filename": filename,
+            "status": status,
+            "content_hash": content_hash,
+            "error": error,
+            "updated_at": time.time(),
+        })
+
+
+def get_file_record(filename: str):
+    """
+    Returns the ingest record for an uploaded file, or None if it was never ingested.
+    """
+    return _read_json(_file_record_path(filename))
+
+
+def remove_file_record(filename: str) -> None:
+    """
+    Forgets the ingest status of a deleted file.
+    """
+    try:
+        os.remove(_file_record_path(filename))
+    except FileNotFoundError:
+        pass
+
+
+def save_artifacts(content_hash: str, version: str, meta: dict, chunks: list[dict]) -> None:
+    """
+    Persists a document's chunk index and metadata. The chunks are written
+    first so a present meta file always means a complete artifact set.
+    Then evicts least recently used artifact sets beyond ARTIFACT_MAX_BYTES.
+    """
+    chunks_path = _content_path(content_hash, version, "chunks.jsonl")
+    tmp_path = f"{chunks_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False))
+            f.write("\n")
+    os.replace(tmp_path, chunks_path)
+    _write_json(_content_path(content_hash, version, "meta.json"), meta)
+    evict()
+
+
+def contains(content_hash: str, version: str) -> bool:
+    """
+    Checks for a complete artifact set without reading it or refreshing its LRU position.
+    """
+    return os.path.exists(_content_path(content_hash, version, "meta.json"))
+
+
+def load_meta(content_hash: str, version: str):
+    """
+    Returns a document's artifact metadata, or None if it has not been ingested.
+    """
+    return _read_json(_content_path(content_hash, version, "meta.json"))
+
+
+def load_chunks(content_hash: str, version: str):
+    """
+    Returns a document's precomputed retrieval chunks, or None if missing.
+    A hit refreshes the meta file's mtime, which is what LRU eviction orders by.
+    """
+    meta_path = _content_path(content_hash, version, "meta.json")
+    try:
+        os.utime(meta_path)
+        with open(_content_path(content_hash, version, "chunks.jsonl"), "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return None
+
+
+def evict(max_bytes: int = None) -> None:
+    """
+    Deletes the least recently used artifact sets until the total size fits.
+    The meta file goes first, so a half-deleted set is never mistaken for a complete one.
+    """
+    limit = ARTIFACT_MAX_BYTES if max_bytes is None else max_bytes
+    # "<hash>.<version>" -> [last used, total size, paths]
+    sets = {}
+    total = 0
+    with os.scandir(ARTIFACT_DIRECTORY) as it:
+        for entry in it:
+            suffix = next((suffix for suffix in _CONTENT_SUFFIXES if entry.name.endswith(suffix)), None)
+            if suffix is None:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            artifact_set = sets.setdefault(entry.name[:-len(suffix)], [0.0, 0, []])
+            artifact_set[0] = max(artifact_set[0], stat.st_mtime)
+            artifact_set[1] += stat.st_size
+            artifact_set[2].append(entry.path)
+            total += stat.st_size
+
+    if total <= limit:
+        return
+
+    for _, size, paths in sorted(sets.values()):
+        if total <= limit:
+            break
+        for path in sorted(paths, key=lambda path: not path.endswith(".meta.json")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+
+def remove_artifacts(content_hash: str) -> None:
+    """
+    Deletes every artifact for the given content, across pipeline versions.
+    """
+    prefix = f"{content_hash}."
+    for name in os.listdir(ARTIFACT_DIRECTORY):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(ARTIFACT_DIRECTORY, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,99 @@
+import os
+import re
+import json
+import time
+import uuid
+
+# --- Configuration ---
+# Generated reports are kept as one JSON file per document ID beside uploads/,
+# so they can be exported later without re-running parsing or LLM calls.
+# Each save prunes documents older than DOCUMENT_MAX_AGE_SECONDS, then the
+# oldest ones beyond DOCUMENT_MAX_FILES.
+DOCUMENT_DIRECTORY = "documents"
+DOCUMENT_MAX_FILES = int(os.environ.get("DOCUMENT_MAX_FILES", 1000))
+DOCUMENT_MAX_AGE_SECONDS = int(os.environ.get("DOCUMENT_MAX_AGE_SECONDS", 30 * 24 * 3600))
+
+os.makedirs(DOCUMENT_DIRECTORY, exist_ok=True)
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _document_path(document_id: str) -> str:
+    return os.path.join(DOCUMENT_DIRECTORY, f"{document_id}.json")
+
+
+def is_valid_id(document_id: str) -> bool:
+    """
+    Document IDs are uuid4 hex strings; anything else is rejected before touching the disk.
+    """
+    return bool(_ID_PATTERN.match(document_id or ""))
+
+
+def save_document(template: list[str], filenames: list[str], tone: str, style: str, sections: list[dict], document: str, mode: str = None, parent_id: str = None) -> dict:
+    """
+    Persists a generated report and returns its record, including the new document ID.
+    parent_id links a regenerated report to the document it was derived from.
+    """
+    record = {
+        "id": uuid.uuid4().hex,
+        "created_at": time.time(),
+        "template": template,
+        "filenames": filenames,
+        "tone": tone,
+        "style": style,
+        "mode": mode,
+        "parent_id": parent_id,
+        "sections": sorted(sections, key=lambda section: section["index"]),
+        "document": document,
+    }
+    path = _document_path(record["id"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    prune_documents(keep=record["id"])
+    return record
+
+
+def prune_documents(keep: str = None) -> int:
+    """
+    Deletes documents older than DOCUMENT_MAX_AGE_SECONDS, then the oldest ones
+    beyond DOCUMENT_MAX_FILES. The document ID in keep is never deleted.
+    Returns the number of documents removed.
+    """
+    entries = []
+    for name in os.listdir(DOCUMENT_DIRECTORY):
+        if not name.endswith(".json") or name == f"{keep}.json":
+            continue
+        path = os.path.join(DOCUMENT_DIRECTORY, name)
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+
+    cutoff = time.time() - DOCUMENT_MAX_AGE_SECONDS
+    allowed = max(0, DOCUMENT_MAX_FILES - (1 if keep else 0))
+    removed = 0
+    for position, (mtime, path) in enumerate(entries):
+        if position < allowed and mtime >= cutoff:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def load_document(document_id: str):
+    """
+    Returns the stored record for a document ID, or None if it does not exist.
+    """
+    if not is_valid_id(document_id):
+        return None
+    try:
+        with open(_document_path(document_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
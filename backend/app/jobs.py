@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import document_store
+from .services import iter_document_sections, assemble_document, export_to_pptx, check_generated
+
+# --- Configuration ---
+# Report jobs run on a local worker pool and are tracked in a SQLite table beside
+# uploads/, so HTTP requests return immediately and clients poll for progress.
+# The table is shared by every server process: each job records the process that
+# owns it, processes heartbeat into a workers table, and cancellation is a flag on
+# the row, so any process can cancel any job.
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", "jobs.sqlite3")
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", 2))
+JOB_KINDS = ("generate", "export_pptx")
+# Unfinished jobs of a process that has not heartbeated for JOB_STALE_SECONDS are failed.
+JOB_HEARTBEAT_SECONDS = int(os.environ.get("JOB_HEARTBEAT_SECONDS", 15))
+JOB_STALE_SECONDS = JOB_HEARTBEAT_SECONDS * 4
+# Finished jobs are deleted this long after they last changed.
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+# Identifies this process in the jobs and workers tables.
+WORKER_ID = uuid.uuid4().hex
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+_lock = threading.Lock()
+_conn = sqlite3.connect(JOBS_DB_PATH, check_same_thread=False, isolation_level=None)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute(
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, request TEXT NOT NULL, "
+    "sections_completed INTEGER NOT NULL DEFAULT 0, sections_total INTEGER NOT NULL DEFAULT 0, "
+    "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+    "owner TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0)"
+)
+# Tables created before jobs had owners get the new columns.
+_columns = {row[1] for row in _conn.execute("PRAGMA table_info(jobs)")}
+if "owner" not in _columns:
+    _conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+if "cancel_requested" not in _columns:
+    _conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+_conn.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, pid INTEGER NOT NULL, heartbeat_at REAL NOT NULL)")
+
+_JOB_COLUMNS = "id, kind, status, sections_completed, sections_total, result, error, created_at, updated_at"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="job")
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a worker when its job has been cancelled.
+    """
+
+
+def _update(job_id: str, **fields) -> None:
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with _lock:
+        _conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _row_to_job(row) -> dict:
+    job_id, kind, status, completed, total, result, error, created_at, updated_at = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "status": status,
+        "progress": {"sections_completed": completed, "sections_total": total},
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+def get_job(job_id: str):
+    """
+    Returns the job's status record, or None if it does not exist.
+    """
+    with _lock:
+        row = _conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def submit_job(kind: str, request: dict) -> dict:
+    """
+    Queues a report job and returns its initial status record.
+    request carries the GenerateRequest fields (template, filenames, tone, style, mode, batch_sections).
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unsupported job kind: {kind}. Supported kinds: {', '.join(JOB_KINDS)}")
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _lock:
+        _conn.execute(
+            "INSERT INTO jobs (id, kind, status, request, sections_total, created_at, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(request), len(request["template"]), now, now, WORKER_ID),
+        )
+    _executor.submit(_run_job, job_id, kind, request)
+    return get_job(job_id)
+
+
+def cancel_job(job_id: str):
+    """
+    Requests cancellation. Queued jobs never start; running jobs stop after the
+    section currently in flight and their pending section calls are dropped.
+    The request is stored on the job's row, so it works from any server process.
+    Returns the updated record, or None if the job does not exist.
+    """
+    now = time.time()
+    with _lock:
+        _conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+            (now, job_id, QUEUED, RUNNING),
+        )
+        _conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, now, job_id, QUEUED),
+        )
+    return get_job(job_id)
+
+
+def _cancel_requested(job_id: str) -> bool:
+    with _lock:
+        row = _conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row is None or bool(row[0])
+
+
+def _maintain() -> None:
+    """
+    Heartbeats this process, fails the unfinished jobs of processes that stopped
+    heartbeating (or of servers that predate job owners), and deletes finished
+    jobs older than JOB_RETENTION_SECONDS. Runs at import and every JOB_HEARTBEAT_SECONDS.
+    """
+    now = time.time()
+    with _lock:
+        _conn.execute(
+            "INSERT OR REPLACE INTO workers (id, pid, heartbeat_at) VALUES (?, ?, ?)",
+            (WORKER_ID, os.getpid(), now),
+        )
+        _conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - JOB_STALE_SECONDS,))
+        # Jobs whose process exited can never finish.
+        _conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?) "
+            "AND (owner IS NULL OR owner NOT IN (SELECT id FROM workers))",
+            (FAILED, "Interrupted by server restart", now, QUEUED, RUNNING),
+        )
+        _conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) AND updated_at < ?",
+            (*FINISHED_STATUSES, now - JOB_RETENTION_SECONDS),
+        )
+
+
+def _maintenance_loop() -> None:
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            _maintain()
+        except Exception as e:
+            print(f"Job maintenance failed: {e}")
+
+
+def _run_job(job_id: str, kind: str, request: dict) -> None:
+    try:
+        if _cancel_requested(job_id):
+            raise JobCancelled()
+        _update(job_id, status=RUNNING)
+
+        sections = []
+        generator = iter_document_sections(
+            request["template"], request["filenames"], request.get("tone"), request.get("style"),
+            mode=request.get("mode"), batch_sections=request.get("batch_sections", False)
+        )
+        try:
+            for section in generator:
+                sections.append(section)
+                _update(job_id, sections_completed=len(sections))
+                if _cancel_requested(job_id):
+                    raise JobCancelled()
+        finally:
+            generator.close()
+
+        demo_sections = check_generated(sections)
+        document = assemble_document(sections)
+        record = document_store.save_document(
+            request["template"], request["filenames"], request.get("tone"), request.get("style"), sections, document,
+            request.get("mode") or "retrieval"
+        )
+        result = {"document_id": record["id"], "demo_sections": demo_sections}
+
+        if kind == "export_pptx":
+            pptx_path = export_to_pptx(document, f"report_{record['id']}")
+            filename = os.path.basename(pptx_path)
+            result.update({"filename": filename, "download_url": f"/api/download/{filename}"})
+
+        _update(job_id, status=COMPLETED, result=json.dumps(result))
+    except JobCancelled:
+        _update(job_id, status=CANCELLED)
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        _update(job_id, status=FAILED, error=str(e))
+
+
+_maintain()
+threading.Thread(target=_maintenance_loop, name="job-maintenance", daemon=True).start()
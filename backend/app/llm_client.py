@@ -0,0 +1,196 @@
+import os
+import time
+import random
+import threading
+
+import httpx
+import openai
+from openai import OpenAI
+
+from . import tokens
+
+# --- Configuration ---
+# Timeouts in seconds. Section calls over a large context can take a while to
+# stream back, so the read timeout is generous; connecting should be quick.
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", 120))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", 10))
+# Retries for 429s, 5xx responses, timeouts and dropped connections.
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 5))
+OPENAI_BACKOFF_BASE = float(os.environ.get("OPENAI_BACKOFF_BASE", 1.0))
+OPENAI_BACKOFF_MAX = float(os.environ.get("OPENAI_BACKOFF_MAX", 30.0))
+# Per-model account limits; 0 disables the corresponding limiter.
+OPENAI_RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", 0))
+OPENAI_TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", 0))
+# Shared connection pool, sized for section, summary and clarify calls in flight at once.
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 32))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get("OPENAI_MAX_KEEPALIVE", 16))
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+# Completion tokens reserved against the TPM limit when a call sets no max_tokens.
+DEFAULT_COMPLETION_ESTIMATE = 1000
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at capacity per minute.
+    acquire() blocks until the requested amount is available.
+    """
+
+    def __init__(self, capacity_per_minute: int):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Takes amount from the bucket, waiting if necessary.
+        Requests larger than the whole bucket wait for a full bucket.
+        Returns the seconds spent waiting.
+        """
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                delay = (amount - self.available) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def refund(self, amount: float) -> None:
+        """
+        Returns over-reserved tokens, e.g. when a completion came back shorter than estimated.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.available = min(self.capacity, self.available + amount)
+
+
+class ResilientClient:
+    """
+    Chat completion client with timeouts, exponential backoff with full jitter,
+    per-model request/token rate limiting and one shared HTTP connection pool.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = OPENAI_TIMEOUT,
+                 connect_timeout: float = OPENAI_CONNECT_TIMEOUT, max_retries: int = OPENAI_MAX_RETRIES,
+                 rpm_limit: int = OPENAI_RPM_LIMIT, tpm_limit: int = OPENAI_TPM_LIMIT,
+                 max_connections: int = OPENAI_MAX_CONNECTIONS, max_keepalive: int = OPENAI_MAX_KEEPALIVE):
+        self.max_retries = max_retries
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.http_client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+        )
+        # Retries are handled here so they share the rate limiter and backoff policy.
+        self.openai = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=self.http_client)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+
+    def _limiters(self, model: str):
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = (
+                    TokenBucket(self.rpm_limit) if self.rpm_limit > 0 else None,
+                    TokenBucket(self.tpm_limit) if self.tpm_limit > 0 else None,
+                )
+            return self._buckets[model]
+
+    def _throttle(self, model: str, estimated_tokens: int) -> None:
+        request_bucket, token_bucket = self._limiters(model)
+        waited = 0.0
+        if request_bucket is not None:
+            waited += request_bucket.acquire(1)
+        if token_bucket is not None:
+            waited += token_bucket.acquire(estimated_tokens)
+        if waited:
+            with self._lock:
+                self.throttled_seconds += waited
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Full-jitter exponential backoff, never shorter than a server-sent Retry-After.
+        """
+        delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+            except ValueError:
+                pass
+        return min(delay, OPENAI_BACKOFF_MAX)
+
+    def chat_completion(self, model: str, messages: list[dict], **options):
+        """
+        Sends a chat completion request, waiting for rate limit capacity first
+        and retrying transient failures. The last error is raised once retries run out.
+        """
+        estimated_tokens = tokens.count_message_tokens(messages, model) + options.get("max_tokens", DEFAULT_COMPLETION_ESTIMATE)
+        for attempt in range(self.max_retries + 1):
+            self._throttle(model, estimated_tokens)
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.openai.chat.completions.create(model=model, messages=messages, **options)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                print(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                raise
+
+            usage = getattr(response, "usage", None)
+            _, token_bucket = self._limiters(model)
+            if token_bucket is not None and usage is not None and usage.total_tokens < estimated_tokens:
+                token_bucket.refund(estimated_tokens - usage.total_tokens)
+            return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "rpm_limit": self.rpm_limit,
+                "tpm_limit": self.tpm_limit,
+            }
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+def create_client_from_env() -> ResilientClient:
+    """
+    Builds the shared client from the OPENAI_* environment variables.
+    """
+    return ResilientClient(api_key=os.environ.get("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL)
@@ -0,0 +1,188 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Configuration ---
+# In-process pipeline metrics, exposed in the Prometheus text format at /api/metrics.
+# Histograms share one set of bucket bounds (seconds), wide enough for both a
+# cached parse and a long section call.
+METRIC_PREFIX = "report_engine_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+DESCRIPTIONS = {
+    "parse_seconds": "Time to extract one uncached source file, by format",
+    "stage_seconds": "Time spent in each document pipeline stage",
+    "section_seconds": "Time to generate one report section, including fallbacks",
+    "llm_request_seconds": "Latency of chat completion API calls, by model",
+    "llm_tokens_total": "Tokens sent to and received from the chat completion API",
+    "llm_cache_hits_total": "Chat completion requests answered from the response cache",
+    "parse_cache_hits_total": "Source files found in the parse cache",
+    "export_seconds": "Time to render one export, by format",
+    "export_cache_hits_total": "Exports served from a previously rendered file",
+}
+
+_lock = threading.Lock()
+# (name, sorted label items) -> [bucket counts..., sum, count]
+_histograms = {}
+# (name, sorted label items) -> value
+_counters = {}
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Per-request breakdown of the observations made while it is active.
+    Shared by every thread that runs in a copy of the request's context.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add(self, event: dict) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> dict:
+        with self._lock:
+            events = list(self.events)
+        stages = {}
+        totals = {"llm_calls": 0, "llm_seconds": 0.0, "tokens_in": 0, "tokens_out": 0, "llm_cache_hits": 0, "parse_cache_hits": 0}
+        for event in events:
+            metric = event["metric"]
+            if metric == "stage_seconds":
+                stages[event["stage"]] = round(stages.get(event["stage"], 0.0) + event["seconds"], 4)
+            elif metric == "llm_request_seconds":
+                totals["llm_calls"] += 1
+                totals["llm_seconds"] = round(totals["llm_seconds"] + event["seconds"], 4)
+            elif metric == "llm_tokens_total":
+                totals["tokens_in" if event["direction"] == "in" else "tokens_out"] += event["value"]
+            elif metric == "llm_cache_hits_total":
+                totals["llm_cache_hits"] += event["value"]
+            elif metric == "parse_cache_hits_total":
+                totals["parse_cache_hits"] += event["value"]
+        return {
+            "total_seconds": round(time.perf_counter() - self.started_at, 4),
+            "stages": stages,
+            **totals,
+            "events": [event for event in events if event["metric"] != "llm_tokens_total"],
+        }
+
+
+@contextmanager
+def collect_request():
+    """
+    Collects a timing breakdown for the code run inside the block (and for
+    thread pool work submitted through submit()). Yields the RequestTimings.
+    """
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    executor.submit that carries the caller's request timings into the worker thread.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def observe(name: str, seconds: float, detail: dict = None, **labels) -> None:
+    """
+    Records a duration in a histogram. labels become Prometheus labels and must
+    have low cardinality; detail (e.g. a filename or section title) is only
+    attached to the active request's timing breakdown.
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add({"metric": name, "seconds": round(seconds, 4), **labels, **(detail or {})})
+
+
+def inc(name: str, amount: float = 1, detail: dict = None, **labels) -> None:
+    """
+    Adds to a counter. Counters with a detail are also added to the request breakdown.
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+    timings = _request_timings.get()
+    if timings is not None and detail is not None:
+        timings.add({"metric": name, "value": amount, **labels, **detail})
+
+
+@contextmanager
+def timer(name: str, detail: dict = None, **labels):
+    """
+    Times the block and records it with observe(), even if it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, detail, **labels)
+
+
+def _format_labels(labels, extra: tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = (f'{key}="{value}"'.replace("\n", " ") for key, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(gauges: dict = None) -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+    gauges maps extra metric names to point-in-time values read at scrape time.
+    """
+    with _lock:
+        histograms = {key: list(value) for key, value in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for metric_type, series in (("counter", counters), ("histogram", histograms)):
+        for name in sorted({name for name, _ in series}):
+            full_name = METRIC_PREFIX + name
+            if name in DESCRIPTIONS:
+                lines.append(f"# HELP {full_name} {DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for (series_name, labels), value in sorted(series.items()):
+                if series_name != name:
+                    continue
+                if metric_type == "counter":
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, value):
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {value[-1]}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {value[-1]}")
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+        lines.append(f"{METRIC_PREFIX}{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
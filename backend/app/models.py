@@ -9,12 +9,63 @@ class GenerateRequest(BaseModel):
     filenames: List[str]
     tone: Optional[str] = "professional"
     style: Optional[str] = "analytical"
+    mode: Optional[str] = "retrieval"
+    batch_sections: Optional[bool] = False
+
+class SectionUsage(BaseModel):
+    """
+    Token usage for one generated section, counted with the local tokenizer.
+    """
+    index: int
+    title: str
+    prompt_tokens: int
+    completion_tokens: int
+    # True when the API call failed and the section holds demo content instead.
+    demo_fallback: bool = False
 
 class GenerateResponse(BaseModel):
     """
     Defines the structure for the /generate API response.
     """
     document: str
+    document_id: Optional[str] = None
+    usage: Optional[List[SectionUsage]] = None
+    # Per-stage timing breakdown, returned when requested with ?timings=true.
+    timings: Optional[dict] = None
+    # Download links for the request's cProfile capture, when profiling was requested.
+    profile: Optional[dict] = None
+    # Set by /documents/{document_id}/regenerate: which section indices were sent
+    # to the model and which were carried over from the previous document.
+    regenerated_sections: Optional[List[int]] = None
+    reused_sections: Optional[List[int]] = None
+
+class RegenerateRequest(BaseModel):
+    """
+    Request model for regenerating a stored document after edits.
+    Fields left unset keep the values the document was generated with.
+    """
+    template: Optional[List[str]] = None
+    filenames: Optional[List[str]] = None
+    tone: Optional[str] = None
+    style: Optional[str] = None
+    mode: Optional[str] = None
+
+class JobRequest(GenerateRequest):
+    """
+    Request model for queuing a background report job.
+    kind is "generate" or "export_pptx".
+    """
+    kind: Optional[str] = "generate"
+
+class ExportRequest(BaseModel):
+    """
+    Request model for exporting an already generated document.
+    Provide either the document_id returned by /generate or the markdown itself.
+    formats lists the output formats: "pptx" (default), "docx" and/or "pdf".
+    """
+    document_id: Optional[str] = None
+    document: Optional[str] = None
+    formats: Optional[List[str]] = None
 
 class ClarifyRequest(BaseModel):
     """
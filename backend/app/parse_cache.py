@@ -0,0 +1,188 @@
+import os
+import hashlib
+import threading
+
+# --- Configuration ---
+# Parsed text is stored beside the uploads directory, keyed by the SHA-256 of
+# the file's bytes plus the parser version, so renaming or re-uploading an
+# identical file is still a hit and a parser change invalidates old entries.
+PARSE_CACHE_DIRECTORY = "parse_cache"
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+HASH_CHUNK_SIZE = 1024 * 1024
+# Cached text is streamed back to callers in blocks of roughly this many characters.
+READ_BLOCK_SIZE = 1024 * 1024
+
+os.makedirs(PARSE_CACHE_DIRECTORY, exist_ok=True)
+
+_lock = threading.Lock()
+# (filepath, size, mtime_ns) -> content hash, so unchanged files are not re-hashed
+_hash_memo = {}
+
+
+def file_hash(filepath: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    The digest is memoised on (path, size, mtime) so repeat lookups are free.
+    """
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    content_hash = digest.hexdigest()
+    remember_hash(filepath, content_hash)
+    return content_hash
+
+
+def known_hash(filepath: str):
+    """
+    Returns the memoised hash for an unchanged file without reading it, or None.
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        return _hash_memo.get((os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns))
+
+
+def remember_hash(filepath: str, content_hash: str) -> None:
+    """
+    Records a hash that was already computed elsewhere (e.g. while uploading).
+    """
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        _hash_memo[memo_key] = content_hash
+
+
+def _entry_path(content_hash: str, parser_version: str) -> str:
+    return os.path.join(PARSE_CACHE_DIRECTORY, f"{content_hash}.v{parser_version}.txt")
+
+
+def get(content_hash: str, parser_version: str):
+    """
+    Returns the cached parsed text, or None on a miss.
+    A hit refreshes the entry's mtime, which is what LRU eviction orders by.
+    """
+    path = _entry_path(content_hash, parser_version)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        os.utime(path)
+        return text
+    except FileNotFoundError:
+        return None
+
+
+def contains(content_hash: str, parser_version: str) -> bool:
+    """
+    Checks for an entry without reading it or refreshing its LRU position.
+    """
+    return os.path.exists(_entry_path(content_hash, parser_version))
+
+
+def read_prefix(content_hash: str, parser_version: str, max_chars: int):
+    """
+    Returns the first max_chars characters of a cached entry, or None on a miss.
+    """
+    try:
+        with open(_entry_path(content_hash, parser_version), "r", encoding="utf-8") as f:
+            return f.read(max_chars)
+    except FileNotFoundError:
+        return None
+
+
+def iter_blocks(content_hash: str, parser_version: str, block_size: int = READ_BLOCK_SIZE):
+    """
+    Streams a cached entry back in blocks that always end on a line boundary,
+    so a citation marker line is never split across two blocks.
+    Raises FileNotFoundError on a miss.
+    """
+    path = _entry_path(content_hash, parser_version)
+    with open(path, "r", encoding="utf-8") as f:
+        os.utime(path)
+        while True:
+            lines = f.readlines(block_size)
+            if not lines:
+                break
+            yield "".join(lines)
+
+
+def put(content_hash: str, parser_version: str, text: str) -> None:
+    """
+    Stores parsed text atomically, then evicts least recently used entries
+    until the cache is back under PARSE_CACHE_MAX_BYTES.
+    """
+    put_chunks(content_hash, parser_version, [text])
+
+
+def put_chunks(content_hash: str, parser_version: str, chunks) -> None:
+    """
+    Streaming form of put: writes an iterable of text chunks joined by newlines,
+    so extraction output never has to be held in memory as one string.
+    """
+    path = _entry_path(content_hash, parser_version)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for position, chunk in enumerate(chunks):
+                if position:
+                    f.write("\n")
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict()
+
+
+def invalidate(content_hash: str) -> None:
+    """
+    Removes every cached parse of the given content, across parser versions.
+    """
+    prefix = f"{content_hash}.v"
+    for name in os.listdir(PARSE_CACHE_DIRECTORY):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(PARSE_CACHE_DIRECTORY, name))
+            except FileNotFoundError:
+                pass
+
+
+def evict(max_bytes: int = None) -> None:
+    """
+    Deletes the least recently used entries until the total size fits.
+    """
+    limit = PARSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    with os.scandir(PARSE_CACHE_DIRECTORY) as it:
+        for entry in it:
+            if not entry.name.endswith(".txt"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    if total <= limit:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,166 @@
+import os
+import io
+import re
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Configuration ---
+# Opt-in cProfile captures of single requests, stored beside uploads/ as
+#   <id>.prof  merged pstats data (load with pstats or snakeviz)
+#   <id>.txt   the top functions by cumulative time
+# Set REQUEST_PROFILING=0 to ignore profiling requests entirely.
+# Each save prunes profiles older than PROFILE_MAX_AGE_SECONDS, then the oldest
+# ones beyond PROFILE_MAX_FILES (counting a .prof/.txt pair as one profile).
+PROFILE_DIRECTORY = "profiles"
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+PROFILE_MAX_AGE_SECONDS = int(os.environ.get("PROFILE_MAX_AGE_SECONDS", 7 * 24 * 3600))
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING", "1") not in ("0", "false", "no")
+PROFILE_SUMMARY_LINES = 60
+_PROFILE_NAME = re.compile(r"^[0-9a-f]{32}\.(prof|txt)$")
+
+os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+_thread_state = threading.local()
+
+
+class RequestProfile:
+    """
+    Collects one cProfile per thread that worked on a request; they are merged on save.
+    cProfile only sees the thread it runs in, so each worker profiles itself.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self.profiles.append(profile)
+
+    def save(self) -> dict:
+        """
+        Writes the merged profile and its text summary. Returns their download info.
+        """
+        with self._lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return None
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        prof_path = os.path.join(PROFILE_DIRECTORY, f"{self.id}.prof")
+        stats.dump_stats(prof_path)
+
+        summary = io.StringIO()
+        pstats.Stats(prof_path, stream=summary).sort_stats("cumulative").print_stats(PROFILE_SUMMARY_LINES)
+        with open(os.path.join(PROFILE_DIRECTORY, f"{self.id}.txt"), "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        prune_profiles(keep=self.id)
+
+        return {
+            "id": self.id,
+            "threads": len(profiles),
+            "download_url": f"/api/profiles/{self.id}.prof",
+            "summary_url": f"/api/profiles/{self.id}.txt",
+        }
+
+
+def prune_profiles(keep: str = None) -> int:
+    """
+    Deletes profiles older than PROFILE_MAX_AGE_SECONDS, then the oldest ones
+    beyond PROFILE_MAX_FILES. The profile ID in keep is never deleted.
+    Returns the number of files removed.
+    """
+    newest = {}
+    for name in os.listdir(PROFILE_DIRECTORY):
+        if not _PROFILE_NAME.match(name) or name.startswith(f"{keep}."):
+            continue
+        profile_id = name.split(".")[0]
+        try:
+            mtime = os.path.getmtime(os.path.join(PROFILE_DIRECTORY, name))
+        except OSError:
+            continue
+        newest[profile_id] = max(mtime, newest.get(profile_id, 0))
+    entries = sorted(((mtime, profile_id) for profile_id, mtime in newest.items()), reverse=True)
+
+    cutoff = time.time() - PROFILE_MAX_AGE_SECONDS
+    allowed = max(0, PROFILE_MAX_FILES - (1 if keep else 0))
+    removed = 0
+    for position, (mtime, profile_id) in enumerate(entries):
+        if position < allowed and mtime >= cutoff:
+            continue
+        for extension in ("prof", "txt"):
+            try:
+                os.remove(os.path.join(PROFILE_DIRECTORY, f"{profile_id}.{extension}"))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def is_requested(flag, header: str = None) -> bool:
+    """
+    True when profiling is allowed and asked for by the query flag or X-Profile header.
+    """
+    header_set = header is not None and header.strip().lower() in ("1", "true", "yes")
+    return REQUEST_PROFILING and (bool(flag) or header_set)
+
+
+@contextmanager
+def profile_request(enabled: bool):
+    """
+    Marks the code inside the block as belonging to a profiled request.
+    Yields the RequestProfile, or None when profiling is not enabled.
+    Only functions started through run() are actually profiled.
+    """
+    if not enabled:
+        yield None
+        return
+    request_profile = RequestProfile()
+    token = _active_profile.set(request_profile)
+    try:
+        yield request_profile
+    finally:
+        _active_profile.reset(token)
+
+
+def run(fn, *args, **kwargs):
+    """
+    Calls fn, under cProfile if the current context belongs to a profiled request.
+    Nested calls in the same thread are already covered and run unprofiled.
+    """
+    request_profile = _active_profile.get()
+    if request_profile is None or getattr(_thread_state, "profiling", False):
+        return fn(*args, **kwargs)
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process; that one sees every thread.
+        return fn(*args, **kwargs)
+    _thread_state.profiling = True
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.disable()
+        _thread_state.profiling = False
+        request_profile.add(profile)
+
+
+def profile_path(filename: str):
+    """
+    Returns the path of a stored profile artifact, or None for unknown or malformed names.
+    """
+    if not _PROFILE_NAME.match(filename):
+        return None
+    path = os.path.join(PROFILE_DIRECTORY, filename)
+    return path if os.path.exists(path) else None
@@ -0,0 +1,268 @@
+import os
+import re
+import html
+import threading
+
+# --- Configuration ---
+# A slide holds at most this many paragraphs (or roughly this many characters);
+# the rest of a section continues on "(cont.)" slides instead of being dropped.
+PPTX_ITEMS_PER_SLIDE = int(os.environ.get("PPTX_ITEMS_PER_SLIDE", 10))
+PPTX_CHARS_PER_SLIDE = int(os.environ.get("PPTX_CHARS_PER_SLIDE", 1200))
+REPORT_TITLE = "Generated Report"
+REPORT_SUBTITLE = "AI-Powered Template Generation Engine"
+# PDF page size (A4, in points) and margin.
+PDF_PAGE_RECT = (0, 0, 595, 842)
+PDF_MARGIN = 54
+_PDF_CSS = """
+body { font-family: sans-serif; font-size: 10pt; line-height: 1.35; }
+h1 { font-size: 22pt; margin-bottom: 4pt; }
+h2 { font-size: 15pt; margin-top: 14pt; }
+h3 { font-size: 12pt; }
+p.subtitle { color: #555555; }
+p.source { font-size: 8pt; color: #666666; }
+"""
+
+_SECTION_HEADING = re.compile(r"^##\s+(.*)$")
+_SUBHEADING = re.compile(r"^#{3,6}\s+(.*)$")
+_LIST_ITEM = re.compile(r"^(\s*)(?:[-*+•]|(\d+)[.)])\s+(.*)$")
+_RULE = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+_EMPHASIS = re.compile(r"\*\*|__|`")
+# *text* with no space inside the asterisks, so "* item" and "2 * 3" are left alone.
+_SINGLE_EMPHASIS = re.compile(r"(?<![\w*])\*(?=[^\s*])([^*\n]*?[^\s*])\*(?![\w*])")
+_CITATION = re.compile(r"\s*\[cite:\s*([^\]]*)\]")
+
+
+def _block(text: str, level: int, kind: str, number: int = None) -> dict:
+    block = {"text": text, "level": level, "kind": kind}
+    if number is not None:
+        block["number"] = number
+    return block
+
+
+def _strip_emphasis(text: str) -> str:
+    return _SINGLE_EMPHASIS.sub(r"\1", _EMPHASIS.sub("", text))
+
+
+def _split_citations(text: str, level: int, kind: str, number: int = None) -> list[dict]:
+    """
+    Separates inline [cite: ...] references from the statement they follow.
+    """
+    blocks = []
+    statement = _CITATION.sub("", text).strip()
+    if statement:
+        blocks.append(_block(statement, level, kind, number))
+    for source in _CITATION.findall(text):
+        blocks.append(_block(source.strip(), level + 1, "source"))
+    return blocks
+
+
+def parse_report(markdown: str) -> list[dict]:
+    """
+    Parses a generated report into its sections in one pass over the lines.
+    Returns [{"title", "blocks"}], where each block is
+    {"text", "level", "kind"} and kind is "heading", "paragraph", "bullet",
+    "numbered" (which also carries the item's "number") or "source" (a
+    citation split out of the preceding block). Text before the first "## "
+    heading becomes an untitled section.
+    """
+    sections = []
+    current = None
+    for line in markdown.splitlines():
+        heading = _SECTION_HEADING.match(line)
+        if heading:
+            current = {"title": _strip_emphasis(heading.group(1)).strip(), "blocks": []}
+            sections.append(current)
+            continue
+        if not line.strip() or _RULE.match(line):
+            continue
+        if current is None:
+            current = {"title": "", "blocks": []}
+            sections.append(current)
+
+        line = _strip_emphasis(line)
+        subheading = _SUBHEADING.match(line)
+        item = _LIST_ITEM.match(line)
+        if subheading:
+            current["blocks"].extend(_split_citations(subheading.group(1), 0, "heading"))
+        elif item:
+            indent = len(item.group(1).expandtabs(4)) // 2
+            level = 1 + min(indent, 3)
+            if item.group(2):
+                current["blocks"].extend(_split_citations(item.group(3), level, "numbered", int(item.group(2))))
+            else:
+                current["blocks"].extend(_split_citations(item.group(3), level, "bullet"))
+        else:
+            current["blocks"].extend(_split_citations(line.strip(), 0, "paragraph"))
+    return sections
+
+
+def paginate(blocks: list[dict], max_items: int = None, max_chars: int = None) -> list[list[dict]]:
+    """
+    Splits a section's blocks into slide-sized pages. A citation stays on the
+    same page as the statement it belongs to. Always returns at least one page.
+    """
+    max_items = max_items or PPTX_ITEMS_PER_SLIDE
+    max_chars = max_chars or PPTX_CHARS_PER_SLIDE
+    pages = []
+    page, chars = [], 0
+    for block in blocks:
+        starts_group = block["kind"] != "source"
+        if page and starts_group and (len(page) >= max_items or chars + len(block["text"]) > max_chars):
+            pages.append(page)
+            page, chars = [], 0
+        page.append(block)
+        chars += len(block["text"])
+    pages.append(page)
+    return pages
+
+
+def _atomic_save(save, output_path: str) -> str:
+    """
+    Writes through a temporary file so concurrent exports never see a partial file.
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        save(tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+
+def render_pptx(sections: list[dict], output_path: str) -> str:
+    """
+    Renders parsed sections to a PowerPoint file: a title slide, then one or
+    more bullet slides per section.
+    """
+    from pptx import Presentation
+    from pptx.util import Pt
+
+    prs = Presentation()
+    title_slide = prs.slides.add_slide(prs.slide_layouts[0])
+    title_slide.shapes.title.text = REPORT_TITLE
+    title_slide.placeholders[1].text = REPORT_SUBTITLE
+
+    bullet_layout = prs.slide_layouts[1]
+    for section in sections:
+        for page_num, page in enumerate(paginate(section["blocks"])):
+            slide = prs.slides.add_slide(bullet_layout)
+            slide.shapes.title.text = section["title"] if page_num == 0 else f"{section['title']} (cont.)"
+            if not page:
+                continue
+
+            text_frame = slide.placeholders[1].text_frame
+            text_frame.clear()
+            for i, block in enumerate(page):
+                p = text_frame.paragraphs[0] if i == 0 else text_frame.add_paragraph()
+                p.level = min(block["level"], 4)
+                if block["kind"] == "source":
+                    p.text = f"[Source: {block['text']}]"
+                    p.font.size = Pt(12)
+                else:
+                    p.text = f"{block['number']}. {block['text']}" if block["kind"] == "numbered" else block["text"]
+                    p.font.size = Pt(18 if block["level"] == 0 else 16)
+                    p.font.bold = block["kind"] == "heading"
+
+    return _atomic_save(prs.save, output_path)
+
+
+def render_docx(sections: list[dict], output_path: str) -> str:
+    """
+    Renders parsed sections to a Word document with real headings and list styles.
+    """
+    import docx
+    from docx.shared import Pt
+
+    document = docx.Document()
+    document.add_heading(REPORT_TITLE, level=0)
+    document.add_paragraph(REPORT_SUBTITLE).runs[0].italic = True
+
+    for section in sections:
+        if section["title"]:
+            document.add_heading(section["title"], level=1)
+        for block in section["blocks"]:
+            if block["kind"] == "heading":
+                document.add_heading(block["text"], level=2)
+            elif block["kind"] == "bullet":
+                style = "List Bullet" if block["level"] <= 1 else f"List Bullet {min(block['level'], 3)}"
+                document.add_paragraph(block["text"], style=style)
+            elif block["kind"] == "numbered":
+                style = "List Number" if block["level"] <= 1 else f"List Number {min(block['level'], 3)}"
+                document.add_paragraph(block["text"], style=style)
+            elif block["kind"] == "source":
+                run = document.add_paragraph().add_run(f"[Source: {block['text']}]")
+                run.italic = True
+                run.font.size = Pt(8)
+            else:
+                document.add_paragraph(block["text"])
+
+    return _atomic_save(document.save, output_path)
+
+
+def _report_html(sections: list[dict]) -> str:
+    parts = [f"<h1>{html.escape(REPORT_TITLE)}</h1>", f"<p class='subtitle'>{html.escape(REPORT_SUBTITLE)}</p>"]
+    list_tag = None  # "ul" or "ol" while inside a list
+    for section in sections:
+        if section["title"]:
+            parts.append(f"<h2>{html.escape(section['title'])}</h2>")
+        for block in section["blocks"]:
+            if block["kind"] == "source" and list_tag:
+                tag = list_tag
+            else:
+                tag = {"bullet": "ul", "numbered": "ol"}.get(block["kind"])
+            if tag != list_tag:
+                if list_tag:
+                    parts.append(f"</{list_tag}>")
+                if tag == "ol":
+                    parts.append(f"<ol start='{block['number']}'>")
+                elif tag:
+                    parts.append(f"<{tag}>")
+            list_tag = tag
+
+            text = html.escape(block["text"])
+            if block["kind"] == "heading":
+                parts.append(f"<h3>{text}</h3>")
+            elif block["kind"] == "source":
+                parts.append(f"<p class='source'>[Source: {text}]</p>")
+            elif block["kind"] in ("bullet", "numbered"):
+                parts.append(f"<li>{text}</li>")
+            else:
+                parts.append(f"<p>{text}</p>")
+        if list_tag:
+            parts.append(f"</{list_tag}>")
+            list_tag = None
+    return "\n".join(parts)
+
+
+def render_pdf(sections: list[dict], output_path: str) -> str:
+    """
+    Renders parsed sections to PDF with PyMuPDF's Story layout engine, which
+    flows the text across as many pages as it needs.
+    """
+    import fitz  # PyMuPDF
+
+    page_rect = fitz.Rect(*PDF_PAGE_RECT)
+    content_rect = page_rect + (PDF_MARGIN, PDF_MARGIN, -PDF_MARGIN, -PDF_MARGIN)
+    story = fitz.Story(html=_report_html(sections), user_css=_PDF_CSS)
+
+    def save(path: str) -> None:
+        writer = fitz.DocumentWriter(path)
+        more = True
+        while more:
+            device = writer.begin_page(page_rect)
+            more, _ = story.place(content_rect)
+            story.draw(device)
+            writer.end_page()
+        writer.close()
+
+    return _atomic_save(save, output_path)
+
+
+# format -> (renderer, file extension, media type)
+RENDERERS = {
+    "pptx": (render_pptx, "pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+    "docx": (render_docx, "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "pdf": (render_pdf, "pdf", "application/pdf"),
+}
+EXPORT_FORMATS = tuple(RENDERERS)
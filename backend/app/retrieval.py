@@ -0,0 +1,180 @@
+import os
+import re
+import math
+from collections import Counter
+
+# --- Configuration ---
+# Number of chunks retrieved per section; 0 disables retrieval and sends the full corpus.
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 8))
+# Consecutive citation units are merged into chunks of roughly this many characters.
+CHUNK_MAX_CHARS = int(os.environ.get("CHUNK_MAX_CHARS", 2000))
+
+# Matches the citation markers emitted by services.parse_document, e.g.
+# [START PAGE 3] ... [END PAGE 3] or [START SHEET: Revenue] ... [END SHEET: Revenue]
+_UNIT_PATTERN = re.compile(
+    r"\[START (PAGE \d+|PARA \d+|SLIDE \d+|SHEET: [^\]]*)\]\n?(.*?)\n?\[END \1\]",
+    re.DOTALL,
+)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "with",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercases and splits text into alphanumeric terms, dropping stopwords.
+    """
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if term not in _STOPWORDS]
+
+
+def iter_units(blocks):
+    """
+    Lazily splits parse_document output, given as an iterable of line-aligned
+    text blocks, into (marker, body) citation units. Text without markers
+    (plain .txt files) is split on blank lines instead.
+    Only the current, still incomplete unit is buffered.
+    """
+    buffer = ""
+    marked = None
+    for block in blocks:
+        buffer += block
+        if marked is None:
+            if not buffer.strip():
+                continue
+            marked = buffer.lstrip().startswith("[START ")
+        
+        if marked:
+            # Units can only complete in a block that contains an end marker.
+            if "[END " not in block:
+                continue
+            consumed = 0
+            for match in _UNIT_PATTERN.finditer(buffer):
+                yield match.group(1), match.group(2)
+                consumed = match.end()
+            buffer = buffer[consumed:]
+        else:
+            pieces = re.split(r"\n\s*\n", buffer)
+            buffer = pieces.pop()
+            for piece in pieces:
+                if piece.strip():
+                    yield None, piece
+    
+    if marked:
+        for match in _UNIT_PATTERN.finditer(buffer):
+            yield match.group(1), match.group(2)
+    elif buffer.strip():
+        yield None, buffer
+
+
+def _render_unit(marker: str, body: str) -> str:
+    if marker is None:
+        return body
+    return f"[START {marker}]\n{body}\n[END {marker}]"
+
+
+def _split_long_unit(marker: str, body: str, max_chars: int) -> list[str]:
+    """
+    Breaks an oversized unit (typically a whole sheet) on line boundaries,
+    repeating its marker on every piece so citations stay valid.
+    """
+    pieces, current, size = [], [], 0
+    for line in body.split("\n"):
+        if current and size + len(line) > max_chars:
+            pieces.append(_render_unit(marker, "\n".join(current)))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append(_render_unit(marker, "\n".join(current)))
+    return pieces
+
+
+def chunk_stream(filename: str, blocks, max_chars: int = None):
+    """
+    Splits one parsed document into retrieval chunks. Consumes line-aligned
+    text blocks (e.g. from the parse cache) and yields chunks as soon as they
+    fill up. Each chunk keeps the original citation markers in its text.
+    """
+    limit = max_chars or CHUNK_MAX_CHARS
+    position = 0
+    current, size = [], 0
+    for marker, body in iter_units(blocks):
+        pieces = _split_long_unit(marker, body, limit) if len(body) > limit else [_render_unit(marker, body)]
+        for text in pieces:
+            if current and size + len(text) > limit:
+                yield _make_chunk(filename, position, "\n".join(current))
+                position += 1
+                current, size = [], 0
+            current.append(text)
+            size += len(text) + 1
+    if current:
+        yield _make_chunk(filename, position, "\n".join(current))
+
+
+def _make_chunk(filename: str, position: int, text: str) -> dict:
+    return {"id": f"{filename}#{position}", "filename": filename, "position": position, "text": text}
+
+
+class BM25Index:
+    """
+    Minimal in-memory Okapi BM25 index over document chunks.
+    """
+
+    def __init__(self, chunks: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def score(self, query_terms: list[str], index: int) -> float:
+        tf = self.term_freqs[index]
+        length_norm = 1 - self.b + self.b * (self.lengths[index] / self.avg_length if self.avg_length else 0)
+        score = 0.0
+        for term in query_terms:
+            freq = tf.get(term)
+            if freq:
+                score += self.idf[term] * freq * (self.k1 + 1) / (freq + self.k1 * length_norm)
+        return score
+
+    def search(self, query: str, top_k: int) -> list[dict]:
+        """
+        Returns the top_k chunks for the query, best first.
+        Falls back to the leading chunks when nothing matches.
+        """
+        query_terms = tokenize(query)
+        scored = [(self.score(query_terms, i), i) for i in range(len(self.chunks))]
+        scored = [(score, i) for score, i in scored if score > 0]
+        if not scored:
+            return self.chunks[:top_k]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self.chunks[i] for _, i in scored[:top_k]]
+
+
+def build_context(chunks: list[dict], filenames: list[str]) -> str:
+    """
+    Renders selected chunks back into the [START DOCUMENT: ...] layout,
+    grouped by source file and kept in their original reading order.
+    """
+    by_file = {}
+    for chunk in chunks:
+        by_file.setdefault(chunk["filename"], []).append(chunk)
+
+    parts = []
+    for filename in dict.fromkeys(filenames):
+        selected = sorted(by_file.get(filename, []), key=lambda chunk: chunk["position"])
+        if selected:
+            body = "\n".join(chunk["text"] for chunk in selected)
+            parts.append(f"[START DOCUMENT: {filename}]\n{body}\n[END DOCUMENT: {filename}]")
+    return "\n\n".join(parts)
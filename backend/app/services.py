@@ -1,5 +1,11 @@
 import os
-from openai import OpenAI
+import re
+import time
+import threading
+import multiprocessing
+from collections import deque, Counter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import docx
 import fitz  # PyMuPDF
 import pandas as pd
@@ -8,81 +14,469 @@ from pptx import Presentation
 from PIL import Image
 import json
 
+from . import parse_cache
+from . import retrieval
+from . import llm_cache
+from . import document_store
+from . import spreadsheets
+from . import tokens
+from . import artifacts
+from . import llm_client
+from . import rendering
+from . import metrics
+from . import profiling
+
 # --- Configuration ---
 # IMPORTANT: Set your OpenAI API key in your environment variables.
 # For a hackathon, you can temporarily hardcode it here, but it's not recommended.
 # client = OpenAI(api_key="YOUR_OPENAI_API_KEY")
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# Shared client with timeouts, retries with backoff, rate limiting and a pooled HTTP connection.
+client = llm_client.create_client_from_env()
+# Identical requests (same model and messages) are answered from this cache.
+response_cache = llm_cache.create_cache_from_env()
 UPLOAD_DIRECTORY = "uploads"
+# Bump whenever the extraction output below changes so stale cache entries are ignored.
+# The spreadsheet settings are part of the version because they change the output.
+PARSER_VERSION = f"3-{spreadsheets.SPREADSHEET_MODE}{spreadsheets.SPREADSHEET_SUMMARY_ROWS}"
+# Model used to write report sections; its prompt budget comes from tokens.MODEL_TOKEN_BUDGETS.
+SECTION_MODEL = os.environ.get("SECTION_MODEL", "gpt-4o")
+# Ingest artifacts depend on both the parser output and the chunking settings.
+ARTIFACT_VERSION = f"{PARSER_VERSION}-c{retrieval.CHUNK_MAX_CHARS}"
+# Cheaper model used to summarise source chunks in map-reduce mode.
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "gpt-4o-mini")
+# Source tokens sent to SUMMARY_MODEL per map call, and the target length of each summary.
+MAP_BATCH_TOKENS = int(os.environ.get("MAP_BATCH_TOKENS", 12000))
+MAP_SUMMARY_TOKENS = int(os.environ.get("MAP_SUMMARY_TOKENS", 800))
+MAP_REDUCE_MAX_LEVELS = 4
+MAX_CONCURRENT_SUMMARIES = int(os.environ.get("MAX_CONCURRENT_SUMMARIES", 8))
+# "retrieval": top-k chunks per section (default).
+# "map_reduce": the whole corpus, summarised by SUMMARY_MODEL until it fits the section budget.
+GENERATION_MODES = ("retrieval", "map_reduce")
+# Batched sections mode writes several sections in one JSON call over a shared context.
+# Each section is assumed to need about BATCH_SECTION_TOKENS of output, and the whole
+# answer must fit in the model's completion limit, else sections are generated one by one.
+BATCH_SECTION_TOKENS = int(os.environ.get("BATCH_SECTION_TOKENS", 1500))
+BATCH_MAX_COMPLETION_TOKENS = int(os.environ.get("BATCH_MAX_COMPLETION_TOKENS", 16000))
+# Upper bound on section LLM calls in flight for a single document.
+MAX_CONCURRENT_SECTIONS = int(os.environ.get("MAX_CONCURRENT_SECTIONS", 4))
+# Worker processes used to extract several uncached files at once.
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", os.cpu_count() or 1))
+# PDFs with more pages than this are extracted as page-range shards across the pool.
+PDF_SHARD_PAGES = int(os.environ.get("PDF_SHARD_PAGES", 200))
+# Characters of each file shown to the clarifying-questions prompt.
+PREVIEW_CHARS = 500
+# Spreadsheet rows read when previewing a workbook.
+PREVIEW_ROWS = 10
+# Pages scanned for text when previewing a PDF whose first pages are blank.
+PREVIEW_MAX_PDF_PAGES = 20
+# Rendered exports are kept apart from uploads/ so they are never listed as source files.
+# They are only a cache of stored documents: beyond EXPORT_MAX_FILES, or once older than
+# EXPORT_MAX_AGE_SECONDS, the least recently used exports are deleted.
+EXPORT_DIRECTORY = "exports"
+EXPORT_MAX_FILES = int(os.environ.get("EXPORT_MAX_FILES", 200))
+EXPORT_MAX_AGE_SECONDS = int(os.environ.get("EXPORT_MAX_AGE_SECONDS", 7 * 24 * 3600))
+
+os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+# Set by the pool initializer in parse workers, which must never submit to a pool themselves.
+_in_parse_worker = False
 
 
 def parse_document(filename: str) -> str:
     """
     Parses the content of an uploaded file (PDF, DOCX, XLSX, PPTX).
     Adds citation markers for page/paragraph/slide/sheet numbers.
+    Results are cached by content hash, so repeat calls skip extraction.
     """
     filepath = os.path.join(UPLOAD_DIRECTORY, filename)
-    content_parts = []
     
     try:
-        if filename.lower().endswith(".pdf"):
-            doc = fitz.open(filepath)
-            for page_num, page in enumerate(doc):
-                text = page.get_text("text")
-                if text.strip():
-                    content_parts.append(f"[START PAGE {page_num + 1}]\n{text}\n[END PAGE {page_num + 1}]")
-            doc.close()
-        
-        elif filename.lower().endswith(".docx"):
-            doc = docx.Document(filepath)
-            for para_num, para in enumerate(doc.paragraphs):
-                if para.text.strip():
-                    content_parts.append(f"[START PARA {para_num + 1}]\n{para.text}\n[END PARA {para_num + 1}]")
-        
-        elif filename.lower().endswith((".xlsx", ".xls")):
-            # Parse Excel files
-            workbook = load_workbook(filepath, data_only=True)
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                content_parts.append(f"[START SHEET: {sheet_name}]")
-                
-                # Extract data from sheet
-                sheet_data = []
-                for row_num, row in enumerate(sheet.iter_rows(values_only=True), 1):
-                    if any(cell is not None for cell in row):
-                        row_data = [str(cell) if cell is not None else "" for cell in row]
-                        sheet_data.append(f"Row {row_num}: {' | '.join(row_data)}")
-                
-                if sheet_data:
-                    content_parts.append("\n".join(sheet_data))
-                content_parts.append(f"[END SHEET: {sheet_name}]")
+        content_hash = parse_cache.file_hash(filepath)
+        cached = parse_cache.get(content_hash, PARSER_VERSION)
+        if cached is not None:
+            return cached
         
-        elif filename.lower().endswith(".pptx"):
-            # Parse PowerPoint files
-            presentation = Presentation(filepath)
-            for slide_num, slide in enumerate(presentation.slides, 1):
-                content_parts.append(f"[START SLIDE {slide_num}]")
-                
-                # Extract text from slide
-                slide_text = []
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        slide_text.append(shape.text)
-                
-                if slide_text:
-                    content_parts.append("\n".join(slide_text))
-                content_parts.append(f"[END SLIDE {slide_num}]")
+        parsed_text = _extract_document(filename, filepath)
+        parse_cache.put(content_hash, PARSER_VERSION, parsed_text)
+        return parsed_text
+    except Exception as e:
+        print(f"Error parsing {filename}: {e}")
+        return f"Error parsing file: {filename}"
+
+
+def _parse_uncached(filename: str, content_hash: str) -> float:
+    """
+    Process-pool entry point: streams one file's extraction into the parse cache.
+    Only the elapsed seconds are returned, so large documents are never pickled
+    back to the parent.
+    """
+    started = time.perf_counter()
+    filepath = os.path.join(UPLOAD_DIRECTORY, filename)
+    parse_cache.put_chunks(content_hash, PARSER_VERSION, iter_document_chunks(filename, filepath))
+    return time.perf_counter() - started
+
+
+def _record_parse(filename: str, seconds: float) -> None:
+    file_format = os.path.splitext(filename)[1].lstrip(".").lower() or "unknown"
+    metrics.observe("parse_seconds", seconds, {"file": filename}, format=file_format)
+
+
+def _init_parse_worker() -> None:
+    global _in_parse_worker
+    _in_parse_worker = True
 
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Lazily starts the shared parsing pool. Workers are spawned rather than
+    forked because the API process already runs threads and open SQLite handles.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_parse_worker,
+            )
+        return _parse_pool
+
+
+def prepare_documents(filenames: list[str]) -> dict:
+    """
+    Makes sure every file is in the parse cache or already has its ingest
+    artifacts, extracting the rest concurrently in the process pool, so a file
+    whose parse entry was evicted is not re-extracted while its chunks exist.
+    Returns {filename: content_hash} in the order given, with None for files
+    that could not be parsed (the reason is logged).
+    """
+    hashes = {}
+    pending = {}
+    for filename in dict.fromkeys(filenames):
+        filepath = os.path.join(UPLOAD_DIRECTORY, filename)
+        try:
+            content_hash = parse_cache.file_hash(filepath)
+        except Exception as e:
+            print(f"Error parsing {filename}: {e}")
+            hashes[filename] = None
+            continue
+        hashes[filename] = content_hash
+        if parse_cache.contains(content_hash, PARSER_VERSION) or artifacts.contains(content_hash, ARTIFACT_VERSION):
+            metrics.inc("parse_cache_hits_total", detail={"file": filename})
         else:
-            # Simple text file fallback
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content_parts.append(f.read())
-                
+            pending[filename] = content_hash
+    
+    if len(pending) == 1 or PARSE_WORKERS <= 1:
+        # A single large PDF still uses the pool through page sharding.
+        for filename, content_hash in pending.items():
+            try:
+                _record_parse(filename, _parse_uncached(filename, content_hash))
+            except Exception as e:
+                print(f"Error parsing {filename}: {e}")
+                hashes[filename] = None
+    elif pending:
+        pool = _get_parse_pool()
+        futures = {
+            filename: pool.submit(_parse_uncached, filename, content_hash)
+            for filename, content_hash in pending.items()
+        }
+        for filename, future in futures.items():
+            try:
+                _record_parse(filename, future.result())
+            except Exception as e:
+                print(f"Error parsing {filename}: {e}")
+                hashes[filename] = None
+    
+    return hashes
+
+
+def iter_parsed_document(filename: str, content_hash: str):
+    """
+    Lazily yields a prepared document's parsed text in line-aligned blocks.
+    Falls back to streaming extraction if the entry was evicted in the meantime.
+    """
+    if content_hash is None:
+        yield f"Error parsing file: {filename}"
+        return
+    try:
+        yield from parse_cache.iter_blocks(content_hash, PARSER_VERSION)
+        return
+    except FileNotFoundError:
+        pass
+    
+    filepath = os.path.join(UPLOAD_DIRECTORY, filename)
+    for position, chunk in enumerate(iter_document_chunks(filename, filepath)):
+        yield chunk if position == 0 else f"\n{chunk}"
+
+
+def _extract_document(filename: str, filepath: str) -> str:
+    """
+    Extracts text from a file without consulting the cache.
+    Raises on failure so that errors are never cached.
+    """
+    return "\n".join(iter_document_chunks(filename, filepath))
+
+
+def ingest_document(filename: str) -> None:
+    """
+    Upload-time ingest pipeline, run in the background after /upload.
+    Parses the file into the parse cache and persists its artifacts (chunk
+    index, page and token counts, short summary) so /generate can read them
+    instead of touching the raw file. Progress is visible via artifacts.get_file_record.
+    """
+    artifacts.set_file_status(filename, artifacts.PROCESSING)
+    try:
+        content_hash = prepare_documents([filename])[filename]
+        if content_hash is None:
+            raise ValueError(f"Could not parse {filename}")
+        if artifacts.load_meta(content_hash, ARTIFACT_VERSION) is None:
+            _build_artifacts(filename, content_hash)
+        artifacts.set_file_status(filename, artifacts.READY, content_hash)
     except Exception as e:
-        print(f"Error parsing {filename}: {e}")
+        print(f"Error ingesting {filename}: {e}")
+        artifacts.set_file_status(filename, artifacts.FAILED, error=str(e))
+
+
+def _build_artifacts(filename: str, content_hash: str) -> list[dict]:
+    """
+    Chunks a prepared document, counts its pages and tokens, and stores the
+    results in the artifact store. Returns the chunks.
+    """
+    chunks = list(retrieval.chunk_stream(filename, iter_parsed_document(filename, content_hash)))
+    # A unit split across chunks repeats its marker in every piece, so count distinct markers.
+    markers = set()
+    chars = 0
+    for chunk in chunks:
+        tokens.chunk_tokens(chunk, SECTION_MODEL)
+        markers.update(re.findall(r"\[START ((?:PAGE|PARA|SLIDE|SHEET)[^\]]*)\]", chunk["text"]))
+        chars += len(chunk["text"])
+    units = Counter(marker.split(":")[0].split(" ")[0] for marker in markers)
+    
+    meta = {
+        "filename": filename,
+        "content_hash": content_hash,
+        "page_count": units.most_common(1)[0][1] if units else 0,
+        "units": {kind.lower(): count for kind, count in units.items()},
+        "chunk_count": len(chunks),
+        "token_count": sum(tokens.chunk_tokens(chunk, SECTION_MODEL) for chunk in chunks),
+        "chars": chars,
+        "summary": parse_cache.read_prefix(content_hash, PARSER_VERSION, PREVIEW_CHARS) or "",
+        "created_at": time.time(),
+    }
+    artifacts.save_artifacts(content_hash, ARTIFACT_VERSION, meta, chunks)
+    return chunks
+
+
+def _document_chunks(filename: str, content_hash: str) -> list[dict]:
+    """
+    Returns a document's retrieval chunks from its ingest artifacts, building
+    and persisting them first if the upload-time ingest has not run yet.
+    Artifacts are content-addressed, so chunks are relabelled with this filename.
+    """
+    if content_hash is None:
+        return list(retrieval.chunk_stream(filename, iter_parsed_document(filename, None)))
+    
+    chunks = artifacts.load_chunks(content_hash, ARTIFACT_VERSION)
+    if chunks is None:
+        return _build_artifacts(filename, content_hash)
+    
+    for chunk in chunks:
+        chunk["filename"] = filename
+        chunk["id"] = f"{filename}#{chunk['position']}"
+    return chunks
+
+
+def preview_document(filename: str, max_chars: int = PREVIEW_CHARS) -> str:
+    """
+    Returns roughly the first max_chars characters of a file's parsed text
+    without parsing the whole file. Uses the upload-time summary or the parse
+    cache when available; otherwise reads only the first page, paragraphs,
+    slide or sheet rows.
+    """
+    filepath = os.path.join(UPLOAD_DIRECTORY, filename)
+    
+    try:
+        record = artifacts.get_file_record(filename)
+        if record and record["status"] == artifacts.READY and max_chars <= PREVIEW_CHARS:
+            meta = artifacts.load_meta(record["content_hash"], ARTIFACT_VERSION)
+            if meta is not None:
+                return meta["summary"][:max_chars]
+        
+        content_hash = parse_cache.known_hash(filepath)
+        if content_hash is not None:
+            cached = parse_cache.read_prefix(content_hash, PARSER_VERSION, max_chars)
+            if cached is not None:
+                return cached
+        
+        return _extract_preview(filename, filepath, max_chars)[:max_chars]
+    except Exception as e:
+        print(f"Error previewing {filename}: {e}")
         return f"Error parsing file: {filename}"
 
-    return "\n".join(content_parts)
+
+def _extract_preview(filename: str, filepath: str, max_chars: int) -> str:
+    """
+    Reads just enough of a file to fill a preview, in parse_document's format.
+    """
+    if filename.lower().endswith(".xlsx"):
+        workbook = load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            sheet_name = workbook.sheetnames[0]
+            rows = islice(workbook[sheet_name].iter_rows(values_only=True), PREVIEW_ROWS)
+            body = "\n".join(
+                f"Row {row_num}: {' | '.join('' if cell is None else str(cell) for cell in row)}"
+                for row_num, row in enumerate(rows, 1)
+                if any(cell is not None for cell in row)
+            )
+            return f"[START SHEET: {sheet_name}]\n{body}"
+        finally:
+            workbook.close()
+    
+    if filename.lower().endswith(".txt") or not filename.lower().endswith((".pdf", ".docx", ".pptx", ".xls")):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read(max_chars)
+    
+    # PDF pages, DOCX paragraphs and PPTX slides are already produced lazily,
+    # so stop as soon as there is enough text. PDFs are read serially here so a
+    # preview never fans out page shards to the parse pool.
+    parts = []
+    size = 0
+    if filename.lower().endswith(".pdf"):
+        chunks = _iter_pdf_range(filepath, 0, PREVIEW_MAX_PDF_PAGES)
+    else:
+        chunks = iter_document_chunks(filename, filepath)
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk) + 1
+            if size >= max_chars:
+                break
+    finally:
+        chunks.close()
+    return "\n".join(parts)
+
+
+def _iter_pdf_range(filepath: str, start: int, stop: int):
+    """
+    Yields page-tagged text for pages [start, stop) of a PDF.
+    """
+    doc = fitz.open(filepath)
+    try:
+        for page_num in range(start, min(stop, doc.page_count)):
+            text = doc[page_num].get_text("text")
+            if text.strip():
+                yield f"[START PAGE {page_num + 1}]\n{text}\n[END PAGE {page_num + 1}]"
+    finally:
+        doc.close()
+
+
+def _extract_pdf_range(filepath: str, start: int, stop: int) -> list[str]:
+    """
+    Process-pool entry point for one page shard.
+    """
+    return list(_iter_pdf_range(filepath, start, stop))
+
+
+def iter_pdf_pages(filepath: str, shard_pages: int = None):
+    """
+    Streams page-tagged chunks from a PDF in page order.
+    PDFs longer than shard_pages are split into page ranges that are extracted
+    in the process pool, with at most PARSE_WORKERS shards in flight so memory
+    stays bounded. Inside pool workers extraction is always serial.
+    """
+    shard = shard_pages or PDF_SHARD_PAGES
+    doc = fitz.open(filepath)
+    page_count = doc.page_count
+    doc.close()
+    
+    if page_count <= shard or PARSE_WORKERS <= 1 or _in_parse_worker:
+        yield from _iter_pdf_range(filepath, 0, page_count)
+        return
+    
+    pool = _get_parse_pool()
+    ranges = iter([(start, start + shard) for start in range(0, page_count, shard)])
+    in_flight = deque(pool.submit(_extract_pdf_range, filepath, *page_range) for page_range in islice(ranges, PARSE_WORKERS))
+    try:
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(_extract_pdf_range, filepath, *next_range))
+            yield from pages
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_document_chunks(filename: str, filepath: str):
+    """
+    Streams a file's text as citation-marked chunks (one page, paragraph or
+    slide at a time) instead of building the whole document in memory.
+    Joining the chunks with newlines gives the parse_document output.
+    """
+    if filename.lower().endswith(".pdf"):
+        yield from iter_pdf_pages(filepath)
+    
+    elif filename.lower().endswith(".docx"):
+        doc = docx.Document(filepath)
+        for para_num, para in enumerate(doc.paragraphs):
+            if para.text.strip():
+                yield f"[START PARA {para_num + 1}]\n{para.text}\n[END PARA {para_num + 1}]"
+    
+    elif filename.lower().endswith((".xlsx", ".xls")):
+        # Parse Excel files in read-only streaming mode; large sheets may be summarised
+        yield from spreadsheets.iter_workbook_chunks(filepath)
+    
+    elif filename.lower().endswith(".pptx"):
+        # Parse PowerPoint files
+        presentation = Presentation(filepath)
+        for slide_num, slide in enumerate(presentation.slides, 1):
+            yield f"[START SLIDE {slide_num}]"
+            
+            # Extract text from slide
+            slide_text = []
+            for shape in slide.shapes:
+                if hasattr(shape, "text") and shape.text.strip():
+                    slide_text.append(shape.text)
+            
+            if slide_text:
+                yield "\n".join(slide_text)
+            yield f"[END SLIDE {slide_num}]"
+
+    else:
+        # Simple text file fallback
+        with open(filepath, 'r', encoding='utf-8') as f:
+            yield f.read()
+
+
+def _chat_completion(model: str, messages: list[dict], **options) -> str:
+    """
+    Sends a chat completion request, answering repeats from the response cache.
+    Extra options (e.g. max_tokens) are passed through and are part of the cache key.
+    Transient API errors are retried by the client; errors that remain propagate
+    so callers can fall back without caching the fallback.
+    """
+    cache_key = None
+    if response_cache is not None:
+        cache_key = llm_cache.fingerprint({"model": model, "messages": messages, **options})
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc("llm_cache_hits_total", detail={}, model=model)
+            return cached
+    
+    with metrics.timer("llm_request_seconds", model=model):
+        response = client.chat_completion(model=model, messages=messages, **options)
+    content = response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.inc("llm_tokens_total", usage.prompt_tokens, {}, model=model, direction="in")
+        metrics.inc("llm_tokens_total", usage.completion_tokens, {}, model=model, direction="out")
+    
+    if cache_key is not None and content:
+        response_cache.set(cache_key, content)
+    return content
 
 
 def generate_demo_content(section_title: str, context: str) -> str:
@@ -163,14 +557,41 @@ The evidence demonstrates clear patterns and trends that support the following o
 *Note: This is demo content. Connect a valid OpenAI API key for AI-generated analysis.*"""
 
 
-def enhanced_generate_report_section(section_title: str, context: str, tone: str = "professional", style: str = "analytical") -> str:
+def _section_messages(section_title: str, context: str, tone: str, style: str) -> list[dict]:
     """
-    Enhanced version that supports tone and style customization.
-    Calls the AI model to generate content for a specific section of the template.
+    Builds the chat messages for one report section.
+    The section title comes last, so calls over the same context share a
+    byte-identical prefix that the provider's prompt cache can reuse.
+    """
+    return _shared_context_messages(context, tone, style, f"""
+    Generate the content for the section: "{section_title}".
+    """)
+
+
+def _batch_messages(template: list[str], context: str, tone: str, style: str) -> list[dict]:
+    """
+    Builds the chat messages for generating every section in one JSON response.
+    Shares its prefix with _section_messages over the same context.
+    """
+    section_list = "\n".join(f"    {position}. {title}" for position, title in enumerate(template, 1))
+    return _shared_context_messages(context, tone, style, f"""
+    Generate the content for each of these sections:
+{section_list}
+
+    Respond with a JSON object of the form {{"sections": {{"1": "...", "2": "..."}}}},
+    keyed by section number, where each value is that section's Markdown content
+    without the section heading.
+    """)
+
+
+def _shared_context_messages(context: str, tone: str, style: str, task: str) -> list[dict]:
+    """
+    System prompt, then source context, then the task: everything before the
+    task depends only on tone, style and context.
     """
     system_prompt = f"""
     You are a world-class business consultant and your task is to generate a section of a report.
-    - You will be given a section title and the full context from source documents.
+    - You will be given the relevant context from source documents and the section(s) to write.
     - Your response MUST be based ONLY on the provided context.
     - You MUST include evidence-backed citations after every statement or claim.
     - Citations should reference the source, like this: [cite: filename, page X], [cite: filename, slide X], [cite: filename, sheet: SheetName], or [cite: filename, para X].
@@ -180,27 +601,54 @@ def enhanced_generate_report_section(section_title: str, context: str, tone: str
     """
     
     user_prompt = f"""
-    Generate the content for the section: "{section_title}".
-
-    Here is the full context from the source documents:
+    Here is the context from the source documents:
     ---
     {context}
     ---
     """
     
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt + task},
+    ]
+
+
+def enhanced_generate_report_section(section_title: str, context: str, tone: str = "professional", style: str = "analytical") -> str:
+    """
+    Enhanced version that supports tone and style customization.
+    Calls the AI model to generate content for a specific section of the template.
+    """
+    return _generate_section(section_title, context, tone, style)["content"]
+
+
+def _generate_section(section_title: str, context: str, tone: str, style: str) -> dict:
+    """
+    Generates one section and reports its token usage, counted with the local tokenizer.
+    "demo_fallback" is set when the API call failed and demo content was used instead.
+    """
+    started = time.perf_counter()
+    messages = _section_messages(section_title, context, tone, style)
+    prompt_tokens = tokens.count_message_tokens(messages, SECTION_MODEL)
+    fallback = False
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Use a powerful model for high-quality output
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
+        content = _chat_completion(
+            model=SECTION_MODEL,  # Use a powerful model for high-quality output
+            messages=messages
         )
-        return response.choices[0].message.content
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
         # Fallback to demo content when API fails
-        return generate_demo_content(section_title, context)
+        content = generate_demo_content(section_title, context)
+        fallback = True
+    
+    metrics.observe("section_seconds", time.perf_counter() - started, {"section": section_title, "demo_fallback": fallback}, mode="single")
+    return {
+        "content": content,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": tokens.count_tokens(content or "", SECTION_MODEL),
+        "demo_fallback": fallback,
+    }
 
 
 def generate_report_section(section_title: str, context: str) -> str:
@@ -210,124 +658,533 @@ def generate_report_section(section_title: str, context: str) -> str:
     return enhanced_generate_report_section(section_title, context, "professional", "analytical")
 
 
-def create_final_document(template: list[str], filenames: list[str], tone: str = "professional", style: str = "analytical") -> str:
+class GenerationUnavailable(Exception):
+    """
+    Raised when no section could be generated by the model, so the report
+    would consist entirely of demo content.
+    """
+
+
+def check_generated(sections: list[dict]) -> list[int]:
+    """
+    Returns the indices of sections that hold demo content because their API
+    call failed. Raises GenerationUnavailable if that is every section, so a
+    report of placeholder text is never stored or shown as the real thing.
+    """
+    fallbacks = sorted(section["index"] for section in sections if section.get("demo_fallback"))
+    if sections and len(fallbacks) == len(sections):
+        raise GenerationUnavailable("The language model could not be reached; no section was generated")
+    return fallbacks
+
+
+def create_final_document(template: list[str], filenames: list[str], tone: str = "professional", style: str = "analytical", max_concurrency: int = None, top_k: int = None, mode: str = None, batch_sections: bool = False) -> str:
     """
     Enhanced version with tone and style support.
     Orchestrates the document creation process.
-    1. Parses all source files to create a combined context.
-    2. Iterates through the template sections, generating content for each.
-    3. Assembles the final report.
+    1. Parses all source files and splits them into citation-preserving chunks.
+    2. Retrieves the top_k most relevant chunks for each section title, or in
+       "map_reduce" mode summarises the whole corpus until it fits the budget.
+    3. Generates content for every template section, up to max_concurrency at a time.
+    4. Assembles the final report in template order.
+    """
+    sections = list(iter_document_sections(template, filenames, tone, style, max_concurrency, top_k, mode, batch_sections))
+    return assemble_document(sections)
+
+
+def create_stored_document(template: list[str], filenames: list[str], tone: str = "professional", style: str = "analytical", max_concurrency: int = None, top_k: int = None, mode: str = None, batch_sections: bool = False) -> dict:
+    """
+    Generates a report like create_final_document and saves it in the document store.
+    Returns the stored record; its "id" lets later exports skip regeneration.
+    Raises GenerationUnavailable instead of storing a report made only of demo content.
     """
-    # 1. Create Combined Context
-    full_context = []
-    for filename in filenames:
-        parsed_text = parse_document(filename)
-        full_context.append(f"[START DOCUMENT: {filename}]\n{parsed_text}\n[END DOCUMENT: {filename}]")
+    sections = list(iter_document_sections(template, filenames, tone, style, max_concurrency, top_k, mode, batch_sections))
+    check_generated(sections)
+    return document_store.save_document(template, filenames, tone, style, sections, assemble_document(sections), mode or "retrieval")
+
+
+def iter_document_sections(template: list[str], filenames: list[str], tone: str = "professional", style: str = "analytical", max_concurrency: int = None, top_k: int = None, mode: str = None, batch_sections: bool = False):
+    """
+    Generator form of create_final_document.
+    Yields {"index", "title", "content", "prompt_tokens", "completion_tokens", "inputs"}
+    dicts in completion order, so callers can stream each section as soon as
+    its LLM call returns. "inputs" records what the section was generated
+    from, so regenerate_document can tell which sections are still current.
+    """
+    mode = mode or "retrieval"
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unsupported generation mode: {mode}. Supported modes: {', '.join(GENERATION_MODES)}")
+    
+    # 1. Parse the sources into the cache, several files at a time
+    with metrics.timer("stage_seconds", stage="parse"):
+        content_hashes = prepare_documents(filenames)
+    
+    # 2. Select the per-section context from the precomputed chunk index
+    with metrics.timer("stage_seconds", stage="context"):
+        section_chunks = _select_section_chunks(template, filenames, content_hashes, top_k, tone, style, mode)
+    
+    section_inputs = [
+        _section_inputs(section, tone, style, mode, chunks, content_hashes)
+        for section, chunks in zip(template, section_chunks)
+    ]
+    
+    # 3. Generate Each Section
+    with metrics.timer("stage_seconds", stage="generate"):
+        if batch_sections:
+            sections = _iter_batched_sections(template, section_chunks, filenames, tone, style, max_concurrency)
+        else:
+            section_contexts = [retrieval.build_context(chunks, filenames) for chunks in section_chunks]
+            sections = _iter_generated_sections(template, section_contexts, tone, style, max_concurrency)
+        try:
+            for section in sections:
+                yield _with_inputs(section, section_inputs[section["index"]])
+        finally:
+            sections.close()
+
+
+def regenerate_document(document_id: str, template: list[str] = None, filenames: list[str] = None, tone: str = None, style: str = None, max_concurrency: int = None, top_k: int = None, mode: str = None):
+    """
+    Regenerates a stored document after its template, sources, tone or style
+    changed; arguments left as None keep the stored values. Each section's
+    inputs (title, tone, style, mode, retrieved chunks and the hashes of the
+    files they came from) are recomputed, and only sections whose inputs no
+    longer match a stored section are sent to the model. Sections generated
+    before inputs were recorded are always regenerated.
+    Returns the new record, saved under a new ID with parent_id set, plus the
+    "regenerated" and "reused" section indices; None if the document does not exist.
+    Raises GenerationUnavailable if every regenerated section fell back to demo content.
+    """
+    previous = document_store.load_document(document_id)
+    if previous is None:
+        return None
+    
+    template = previous["template"] if template is None else template
+    filenames = previous["filenames"] if filenames is None else filenames
+    tone = previous["tone"] if tone is None else tone
+    style = previous["style"] if style is None else style
+    mode = mode or previous.get("mode") or "retrieval"
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unsupported generation mode: {mode}. Supported modes: {', '.join(GENERATION_MODES)}")
+    
+    with metrics.timer("stage_seconds", stage="parse"):
+        content_hashes = prepare_documents(filenames)
+    if mode == "map_reduce":
+        # The context is summarised from the whole corpus, so the source hashes
+        # identify it; summaries are only built if some section is stale.
+        section_chunks = None
+        section_inputs = [_section_inputs(section, tone, style, mode, None, content_hashes) for section in template]
+    else:
+        with metrics.timer("stage_seconds", stage="context"):
+            section_chunks = _select_section_chunks(template, filenames, content_hashes, top_k, tone, style, mode)
+        section_inputs = [
+            _section_inputs(section, tone, style, mode, chunks, content_hashes)
+            for section, chunks in zip(template, section_chunks)
+        ]
     
-    combined_context = "\n\n".join(full_context)
+    # Stored sections by input fingerprint; a repeated title can reuse each match once.
+    reusable = {}
+    for section in previous["sections"]:
+        if section.get("inputs"):
+            reusable.setdefault(llm_cache.fingerprint(section["inputs"]), []).append(section)
     
-    # 2. Generate Each Section
+    sections = []
+    stale = []
+    for index, (title, inputs) in enumerate(zip(template, section_inputs)):
+        matches = reusable.get(llm_cache.fingerprint(inputs))
+        if matches:
+            sections.append({**matches.pop(0), "index": index, "title": title, "inputs": inputs})
+        else:
+            stale.append(index)
+    reused = [section["index"] for section in sections]
+    
+    if stale:
+        titles = [template[index] for index in stale]
+        if section_chunks is None:
+            with metrics.timer("stage_seconds", stage="context"):
+                stale_chunks = _select_section_chunks(titles, filenames, content_hashes, top_k, tone, style, mode)
+        else:
+            stale_chunks = [section_chunks[index] for index in stale]
+        contexts = [retrieval.build_context(chunks, filenames) for chunks in stale_chunks]
+        regenerated = []
+        with metrics.timer("stage_seconds", stage="generate"):
+            for section in _iter_generated_sections(titles, contexts, tone, style, max_concurrency):
+                index = stale[section["index"]]
+                regenerated.append(_with_inputs({**section, "index": index}, section_inputs[index]))
+        check_generated(regenerated)
+        sections.extend(regenerated)
+    print(f"Regenerated {len(stale)} of {len(template)} sections of document {document_id}")
+    
+    record = document_store.save_document(
+        template, filenames, tone, style, sections, assemble_document(sections), mode, parent_id=document_id
+    )
+    return {**record, "regenerated": stale, "reused": sorted(reused)}
+
+
+def _with_inputs(section: dict, inputs: dict) -> dict:
+    """
+    Attaches a section's inputs. Demo fallback content gets none, so the next
+    regeneration retries it instead of reusing it.
+    """
+    return {**section, "inputs": None if section.get("demo_fallback") else inputs}
+
+
+def _section_inputs(section_title: str, tone: str, style: str, mode: str, chunks: list[dict], content_hashes: dict) -> dict:
+    """
+    Everything a section's content depends on. Chunks are identified by ID and
+    by the hash of their source file, so an edited file invalidates only the
+    sections that retrieved from it. In map_reduce mode every section's context
+    is summarised from the whole corpus, so it is identified by the hashes of
+    all sources instead, and chunks may be None.
+    """
+    if mode == "map_reduce":
+        return {
+            "title": section_title,
+            "tone": tone,
+            "style": style,
+            "mode": mode,
+            "model": SECTION_MODEL,
+            "summary_model": SUMMARY_MODEL,
+            "pipeline": ARTIFACT_VERSION,
+            "sources": dict(content_hashes),
+        }
+    return {
+        "title": section_title,
+        "tone": tone,
+        "style": style,
+        "mode": mode,
+        "model": SECTION_MODEL,
+        "pipeline": ARTIFACT_VERSION,
+        "sources": {chunk["filename"]: content_hashes.get(chunk["filename"]) for chunk in chunks},
+        "chunks": [chunk["id"] for chunk in chunks],
+    }
+
+
+def assemble_document(sections: list[dict]) -> str:
+    """
+    Joins generated sections into the final markdown report, in template order.
+    """
     document_parts = []
-    for section in template:
-        # Add section title
-        document_parts.append(f"## {section}\n")
-        
-        # Generate section content with tone and style
-        section_content = enhanced_generate_report_section(section, combined_context, tone, style)
-        document_parts.append(section_content)
+    for section in sorted(sections, key=lambda item: item["index"]):
+        document_parts.append(f"## {section['title']}\n")
+        document_parts.append(section["content"])
         document_parts.append("\n---\n") # Separator
         
     return "\n".join(document_parts)
 
 
-def export_to_pptx(document_content: str, filename: str = "generated_presentation") -> str:
+def _select_section_chunks(template: list[str], filenames: list[str], content_hashes: dict, top_k: int = None, tone: str = "professional", style: str = "analytical", mode: str = "retrieval") -> list[list[dict]]:
     """
-    Exports document content to PowerPoint (PPTX) format.
-    Returns the file path of the generated presentation.
+    Returns the chunks for each section, packed to SECTION_MODEL's token budget.
+    Chunks come from the upload-time ingest artifacts when available.
+    In retrieval mode a BM25 index selects the top_k chunks per section title.
+    Whole-corpus context (map_reduce mode, top_k of 0, or corpora of at most
+    top_k chunks) is summarised map-reduce style whenever it exceeds the budget.
+    """
+    k = retrieval.RETRIEVAL_TOP_K if top_k is None else top_k
+    chunks = []
+    for filename, content_hash in content_hashes.items():
+        chunks.extend(_document_chunks(filename, content_hash))
+    
+    if not template:
+        return []
+    if mode == "map_reduce" or k <= 0 or len(chunks) <= k:
+        budget = min(_context_budget(section, filenames, tone, style) for section in template)
+        candidates = [_map_reduce_chunks(chunks, budget)] * len(template)
+    else:
+        index = retrieval.BM25Index(chunks)
+        candidates = [index.search(section, k) for section in template]
+    
+    selected = []
+    for section, section_chunks in zip(template, candidates):
+        budget = _context_budget(section, filenames, tone, style)
+        packed = tokens.pack_chunks(section_chunks, budget, SECTION_MODEL)
+        if len(packed) < len(section_chunks):
+            print(f"Context for section '{section}' packed to {len(packed)} of {len(section_chunks)} chunks ({budget} token budget)")
+        selected.append(packed)
+    return selected
+
+
+def _map_reduce_chunks(chunks: list[dict], budget: int) -> list[dict]:
+    """
+    Shrinks a corpus that does not fit the section budget.
+    Map: batches of chunks are summarised concurrently by SUMMARY_MODEL.
+    Reduce: the summaries are batched and summarised again, level by level,
+    until they fit. Summaries keep inline [cite: ...] references, so the
+    section writer can still cite the original pages.
+    """
+    current = chunks
+    for level in range(1, MAP_REDUCE_MAX_LEVELS + 1):
+        if sum(tokens.chunk_tokens(chunk, SECTION_MODEL) for chunk in current) <= budget:
+            break
+        batches = _batch_chunks(current, MAP_BATCH_TOKENS)
+        if level > 1 and len(batches) >= len(current):
+            # Summaries are already as coarse as one batch each; packing handles the rest.
+            break
+        workers = max(1, min(MAX_CONCURRENT_SUMMARIES, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary") as executor:
+            futures = [metrics.submit(executor, profiling.run, _summarize_batch, batch) for batch in batches]
+            summaries = [future.result() for future in futures]
+        current = [
+            {
+                "id": f"{batch[0]['filename']}#summary-{level}-{position}",
+                "filename": batch[0]["filename"],
+                "position": position,
+                "text": summary,
+            }
+            for position, (batch, summary) in enumerate(zip(batches, summaries))
+        ]
+        print(f"Map-reduce level {level}: {len(batches)} summaries")
+    return current
+
+
+def _batch_chunks(chunks: list[dict], max_tokens: int) -> list[list[dict]]:
+    """
+    Groups consecutive chunks into batches of at most max_tokens, starting a
+    new batch whenever the source file changes so summaries stay attributable.
+    """
+    batches = []
+    current, size = [], 0
+    for chunk in chunks:
+        chunk_size = tokens.chunk_tokens(chunk, SECTION_MODEL)
+        if current and (size + chunk_size > max_tokens or chunk["filename"] != current[-1]["filename"]):
+            batches.append(current)
+            current, size = [], 0
+        current.append(chunk)
+        size += chunk_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _summarize_batch(batch: list[dict]) -> str:
     """
+    Summarises one batch of source chunks with SUMMARY_MODEL, preserving citations.
+    Falls back to the leading text of the batch when the API is unavailable.
+    """
+    source_text = "\n".join(f"[SOURCE FILE: {chunk['filename']}]\n{chunk['text']}" for chunk in batch)
+    system_prompt = f"""
+    You condense source material for a report writer who will never see the original.
+    - Keep every fact, figure, name and date that could matter in a business report.
+    - End every statement with a citation to its origin, using the file name and the nearest
+      [START PAGE n], [START SLIDE n], [START SHEET: name] or [START PARA n] marker, like this:
+      [cite: filename, page X], [cite: filename, slide X], [cite: filename, sheet: SheetName], or [cite: filename, para X].
+    - Keep existing [cite: ...] references unchanged.
+    - Respond with concise Markdown bullet points, at most about {MAP_SUMMARY_TOKENS} tokens.
+    """
+    
     try:
-        from pptx import Presentation
-        from pptx.util import Inches, Pt
-        from pptx.enum.text import PP_ALIGN
-        
-        # Create a presentation object
-        prs = Presentation()
-        
-        # Split document into sections
-        sections = document_content.split('## ')
-        sections = [section.strip() for section in sections if section.strip()]
-        
-        # Add title slide
-        title_slide_layout = prs.slide_layouts[0]  # Title slide layout
-        slide = prs.slides.add_slide(title_slide_layout)
-        title = slide.shapes.title
-        subtitle = slide.placeholders[1]
-        
-        title.text = "Generated Report"
-        subtitle.text = "AI-Powered Template Generation Engine"
-        
-        # Process each section
-        for section in sections:
-            if not section.strip():
-                continue
-                
-            lines = section.split('\n')
-            section_title = lines[0].strip()
-            section_content = '\n'.join(lines[1:]).strip()
-            
-            # Create a new slide for each section
-            bullet_slide_layout = prs.slide_layouts[1]  # Content slide layout
-            slide = prs.slides.add_slide(bullet_slide_layout)
-            
-            # Set slide title
-            title = slide.shapes.title
-            title.text = section_title
-            
-            # Add content
-            content_placeholder = slide.placeholders[1]
-            
-            # Clean content for presentation
-            clean_content = section_content
-            clean_content = clean_content.replace('**', '')
-            clean_content = clean_content.replace('*', '•')
-            clean_content = clean_content.replace('[cite:', '\n[Source:')
-            clean_content = clean_content.replace('---', '')
-            
-            # Split into paragraphs and bullets
-            paragraphs = [p.strip() for p in clean_content.split('\n') if p.strip()]
-            
-            if paragraphs:
-                text_frame = content_placeholder.text_frame
-                text_frame.clear()
-                
-                for i, paragraph in enumerate(paragraphs[:10]):  # Limit to 10 items per slide
-                    if i == 0:
-                        p = text_frame.paragraphs[0]
-                    else:
-                        p = text_frame.add_paragraph()
-                    
-                    p.text = paragraph
-                    p.level = 1 if paragraph.startswith('•') else 0
-                    p.font.size = Pt(18 if p.level == 0 else 16)
-        
-        # Save the presentation
-        output_path = os.path.join(UPLOAD_DIRECTORY, f"{filename}.pptx")
-        prs.save(output_path)
-        
-        return output_path
-        
+        return _chat_completion(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": source_text},
+            ],
+            max_tokens=MAP_SUMMARY_TOKENS * 2
+        )
     except Exception as e:
-        print(f"Error creating PowerPoint: {e}")
-        raise e
+        print(f"Error calling OpenAI API for summary: {e}")
+        return source_text[:MAP_SUMMARY_TOKENS * tokens.CHARS_PER_TOKEN]
+
+
+def _context_budget(section_title: str, filenames: list[str], tone: str, style: str) -> int:
+    """
+    Tokens left for source context once the section prompt itself and the
+    per-document markers are accounted for.
+    """
+    scaffold = tokens.count_message_tokens(_section_messages(section_title, "", tone, style), SECTION_MODEL)
+    markers = sum(tokens.count_tokens(f"[START DOCUMENT: {name}]\n[END DOCUMENT: {name}]\n\n", SECTION_MODEL) for name in filenames)
+    return max(0, tokens.prompt_budget(SECTION_MODEL) - scaffold - markers)
+
+
+def _iter_generated_sections(template: list[str], contexts: list[str], tone: str, style: str, max_concurrency: int = None):
+    """
+    Generates every section with a bounded worker pool and yields each one
+    as soon as it completes. Pending calls are cancelled if the consumer stops early.
+    """
+    limit = max_concurrency or MAX_CONCURRENT_SECTIONS
+    workers = max(1, min(limit, len(template)))
+    if workers == 1:
+        for index, (section, context) in enumerate(zip(template, contexts)):
+            yield {"index": index, "title": section, **_generate_section(section, context, tone, style)}
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="section")
+    try:
+        futures = {
+            metrics.submit(executor, profiling.run, _generate_section, section, context, tone, style): index
+            for index, (section, context) in enumerate(zip(template, contexts))
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            yield {"index": index, "title": template[index], **future.result()}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _iter_batched_sections(template: list[str], section_chunks: list[list[dict]], filenames: list[str], tone: str, style: str, max_concurrency: int = None):
+    """
+    Generates all sections with one structured-output call over the union of
+    their chunks. Falls back to per-section calls when the shared context or
+    the combined answer would not fit, and for any section the batched
+    response leaves out; those calls reuse the shared context so their prompt
+    prefix is already cached by the provider.
+    """
+    shared_chunks = list({chunk["id"]: chunk for chunks in section_chunks for chunk in chunks}.values())
+    context_tokens = sum(tokens.chunk_tokens(chunk, SECTION_MODEL) for chunk in shared_chunks)
+    budget = _batch_context_budget(template, filenames, tone, style)
+    if len(template) * BATCH_SECTION_TOKENS > BATCH_MAX_COMPLETION_TOKENS or context_tokens > budget:
+        print(f"Batched sections exceed the budget ({context_tokens} context tokens, {budget} available), generating per section")
+        section_contexts = [retrieval.build_context(chunks, filenames) for chunks in section_chunks]
+        yield from _iter_generated_sections(template, section_contexts, tone, style, max_concurrency)
+        return
+    
+    context = retrieval.build_context(shared_chunks, filenames)
+    generated = _generate_batch(template, context, tone, style)
+    for index in sorted(generated):
+        yield {"index": index, "title": template[index], **generated[index]}
+    
+    missing = [index for index in range(len(template)) if index not in generated]
+    if missing:
+        print(f"Batched response missed {len(missing)} of {len(template)} sections, generating them per section")
+        titles = [template[index] for index in missing]
+        for section in _iter_generated_sections(titles, [context] * len(missing), tone, style, max_concurrency):
+            yield {**section, "index": missing[section["index"]]}
+
+
+def _batch_context_budget(template: list[str], filenames: list[str], tone: str, style: str) -> int:
+    """
+    Tokens left for the shared context of a batched call.
+    """
+    scaffold = tokens.count_message_tokens(_batch_messages(template, "", tone, style), SECTION_MODEL)
+    markers = sum(tokens.count_tokens(f"[START DOCUMENT: {name}]\n[END DOCUMENT: {name}]\n\n", SECTION_MODEL) for name in filenames)
+    return max(0, tokens.prompt_budget(SECTION_MODEL) - scaffold - markers)
+
+
+def _generate_batch(template: list[str], context: str, tone: str, style: str) -> dict:
+    """
+    Generates every section in one JSON-mode call.
+    Returns {index: {"content", "prompt_tokens", "completion_tokens"}} for the
+    sections present in the response; empty if the call or its JSON failed.
+    The shared prompt's tokens are split evenly across the returned sections.
+    """
+    messages = _batch_messages(template, context, tone, style)
+    try:
+        with metrics.timer("section_seconds", {"sections": len(template)}, mode="batched"):
+            raw = _chat_completion(
+                model=SECTION_MODEL,
+                messages=messages,
+                response_format={"type": "json_object"},
+                max_tokens=BATCH_MAX_COMPLETION_TOKENS
+            )
+        payload = json.loads(raw)["sections"]
+    except Exception as e:
+        print(f"Error generating batched sections: {e}")
+        return {}
+    
+    contents = {}
+    for index in range(len(template)):
+        content = payload.get(str(index + 1)) if isinstance(payload, dict) else None
+        if isinstance(content, str) and content.strip():
+            contents[index] = content
+    if not contents:
+        return {}
+    
+    prompt_share = tokens.count_message_tokens(messages, SECTION_MODEL) // len(contents)
+    return {
+        index: {
+            "content": content,
+            "prompt_tokens": prompt_share,
+            "completion_tokens": tokens.count_tokens(content, SECTION_MODEL),
+        }
+        for index, content in contents.items()
+    }
+
+
+def export_to_pptx(document_content: str, filename: str = "generated_presentation") -> str:
+    """
+    Exports document content to PowerPoint (PPTX) format.
+    The markdown is parsed once into sections and bullets; long sections
+    continue on extra slides. Returns the file path of the generated presentation.
+    """
+    return export_document(document_content, ["pptx"], filename)["pptx"]
+
+
+def export_document(document_content: str, formats: list[str], filename: str, reuse: bool = False) -> dict:
+    """
+    Renders document content to each requested format (see rendering.EXPORT_FORMATS),
+    parsing the markdown once for all of them. Returns {format: file path}.
+    With reuse=True an existing file of the same name is returned as is, which
+    is how exports of stored documents (named after their ID) are cached.
+    Files are written to EXPORT_DIRECTORY, which is pruned after each render.
+    """
+    unsupported = [fmt for fmt in formats if fmt not in rendering.RENDERERS]
+    if unsupported:
+        raise ValueError(f"Unsupported export format: {', '.join(unsupported)}. Supported formats: {', '.join(rendering.EXPORT_FORMATS)}")
+    
+    paths = {}
+    sections = None
+    for fmt in formats:
+        render, extension, _ = rendering.RENDERERS[fmt]
+        output_path = os.path.join(EXPORT_DIRECTORY, f"{filename}.{extension}")
+        if reuse and os.path.exists(output_path):
+            metrics.inc("export_cache_hits_total", detail={"format": fmt}, format=fmt)
+            os.utime(output_path)  # marks it recently used for prune_exports
+            paths[fmt] = output_path
+            continue
+        try:
+            with metrics.timer("export_seconds", format=fmt):
+                if sections is None:
+                    sections = rendering.parse_report(document_content)
+                paths[fmt] = render(sections, output_path)
+        except Exception as e:
+            print(f"Error creating {fmt} export: {e}")
+            raise e
+    if sections is not None:
+        prune_exports(keep=paths.values())
+    return paths
+
+
+def prune_exports(keep=()) -> int:
+    """
+    Deletes exports older than EXPORT_MAX_AGE_SECONDS, then the least recently
+    used ones beyond EXPORT_MAX_FILES. Paths in keep are never deleted.
+    Returns the number of files removed.
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    entries = []
+    for name in os.listdir(EXPORT_DIRECTORY):
+        path = os.path.join(EXPORT_DIRECTORY, name)
+        if name.endswith(".tmp") or os.path.abspath(path) in keep:
+            continue
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    
+    cutoff = time.time() - EXPORT_MAX_AGE_SECONDS
+    allowed = max(0, EXPORT_MAX_FILES - len(keep))
+    removed = 0
+    for position, (mtime, path) in enumerate(entries):
+        if position < allowed and mtime >= cutoff:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
 
 
 def ask_clarifying_questions(template: list[str], filenames: list[str]) -> str:
     """
     AI-powered function to ask clarifying questions based on template and uploaded files.
     """
+    # Previews only read the start of each file, and run concurrently
     files_summary = []
-    for filename in filenames:
-        parsed_content = parse_document(filename)[:500]  # Get first 500 chars for summary
+    workers = max(1, min(len(filenames), MAX_CONCURRENT_SECTIONS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview") as executor:
+        previews = list(executor.map(preview_document, filenames))
+    for filename, parsed_content in zip(filenames, previews):
         files_summary.append(f"- {filename}: {parsed_content[:100]}...")
     
     files_text = "\n".join(files_summary)
@@ -355,14 +1212,13 @@ def ask_clarifying_questions(template: list[str], filenames: list[str]) -> str:
     """
     
     try:
-        response = client.chat.completions.create(
+        return _chat_completion(
             model="gpt-4o-mini",  # Use cheaper model for questions
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ]
         )
-        return response.choices[0].message.content
     except Exception as e:
         print(f"Error calling OpenAI API for questions: {e}")
         return "What is the target audience for this document?\nWhat specific timeframe should the analysis cover?\nAre there any particular metrics or KPIs you'd like to focus on?"
\ No newline at end of file
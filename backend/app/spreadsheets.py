@@ -0,0 +1,188 @@
+import os
+import datetime
+from collections import deque
+from openpyxl import load_workbook
+
+# --- Configuration ---
+# SPREADSHEET_MODE controls how sheets reach the prompt:
+#   "rows"    - every non-empty row as "Row n: a | b | c"
+#   "summary" - schema, column types, aggregates and sampled rows only
+#   "auto"    - rows for small sheets, a summary once a sheet exceeds SPREADSHEET_SUMMARY_ROWS
+SPREADSHEET_MODE = os.environ.get("SPREADSHEET_MODE", "auto").lower()
+SPREADSHEET_SUMMARY_ROWS = int(os.environ.get("SPREADSHEET_SUMMARY_ROWS", 2000))
+SPREADSHEET_SAMPLE_ROWS = int(os.environ.get("SPREADSHEET_SAMPLE_ROWS", 5))
+# Rows are emitted in batches so huge sheets stream instead of building one string.
+ROW_BATCH_SIZE = 1000
+MAX_DISTINCT_VALUES = 10
+
+
+def _format_row(row_num: int, row: tuple) -> str:
+    row_data = [str(cell) if cell is not None else "" for cell in row]
+    return f"Row {row_num}: {' | '.join(row_data)}"
+
+
+def _format_number(value) -> str:
+    return f"{value:,.2f}" if isinstance(value, float) else f"{value:,}"
+
+
+class ColumnStats:
+    """
+    Running statistics for one column, updated a row at a time in constant memory.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.non_empty = 0
+        self.numeric = 0
+        self.dates = 0
+        self.text = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.distinct = set()
+        self.too_many_distinct = False
+
+    def add(self, value) -> None:
+        if value is None or value == "":
+            return
+        self.non_empty += 1
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric += 1
+            self.total += value
+            self._track_range(value)
+        elif isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+            self.dates += 1
+            self._track_range(value)
+        else:
+            self.text += 1
+            if not self.too_many_distinct:
+                self.distinct.add(str(value))
+                if len(self.distinct) > MAX_DISTINCT_VALUES:
+                    self.too_many_distinct = True
+                    self.distinct.clear()
+
+    def _track_range(self, value) -> None:
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        except TypeError:
+            # Mixed date/time types cannot be compared; keep the first range seen.
+            pass
+
+    def describe(self) -> str:
+        if not self.non_empty:
+            return f"- {self.name}: empty"
+        if self.numeric >= max(self.dates, self.text):
+            mean = self.total / self.numeric
+            return (
+                f"- {self.name}: numeric, {self.non_empty} non-empty; min {_format_number(self.minimum)}, "
+                f"max {_format_number(self.maximum)}, mean {_format_number(mean)}, sum {_format_number(self.total)}"
+            )
+        if self.dates >= self.text:
+            return f"- {self.name}: date, {self.non_empty} non-empty; from {self.minimum} to {self.maximum}"
+        if self.too_many_distinct:
+            return f"- {self.name}: text, {self.non_empty} non-empty; more than {MAX_DISTINCT_VALUES} distinct values"
+        values = ", ".join(sorted(self.distinct))
+        return f"- {self.name}: text, {self.non_empty} non-empty; values: {values}"
+
+
+class SheetSummary:
+    """
+    Builds a compact description of a sheet (schema, dtypes, aggregates and
+    the first and last rows) from a single streaming pass over its rows.
+    """
+
+    def __init__(self, sheet_name: str, sample_rows: int = SPREADSHEET_SAMPLE_ROWS):
+        self.sheet_name = sheet_name
+        self.header = None
+        self.columns = []
+        self.row_count = 0
+        self.first_rows = []
+        self.last_rows = deque(maxlen=sample_rows)
+        self.sample_rows = sample_rows
+
+    def add(self, row_num: int, row: tuple) -> None:
+        # Only the first non-empty row can be the header; a text-only row further
+        # down (e.g. a "Total" line) is data and must not reset the columns.
+        is_first = self.header is None and not self.row_count
+        if is_first and all(isinstance(cell, str) or cell is None for cell in row):
+            self.header = (row_num, row)
+            self.columns = [ColumnStats(str(cell) if cell else f"Column {i + 1}") for i, cell in enumerate(row)]
+            return
+
+        self.row_count += 1
+        for i, cell in enumerate(row):
+            if i >= len(self.columns):
+                self.columns.append(ColumnStats(f"Column {i + 1}"))
+            self.columns[i].add(cell)
+
+        line = _format_row(row_num, row)
+        if len(self.first_rows) < self.sample_rows:
+            self.first_rows.append(line)
+        else:
+            self.last_rows.append(line)
+
+    def render(self) -> str:
+        lines = [f"Summary of sheet {self.sheet_name}: {self.row_count} data rows x {len(self.columns)} columns"]
+        if self.header is not None:
+            lines.append(f"Header {_format_row(*self.header)}")
+        lines.append("Columns:")
+        lines.extend(column.describe() for column in self.columns)
+        lines.append("Sample rows:")
+        lines.extend(self.first_rows)
+        if self.last_rows:
+            lines.append("...")
+            lines.extend(self.last_rows)
+        return "\n".join(lines)
+
+
+def _iter_sheet(sheet_name: str, rows, mode: str, summary_rows: int):
+    """
+    Yields the body of one sheet, either as row batches or as a summary.
+    In auto mode up to summary_rows rows are buffered; past that the buffer is
+    dropped and only the running summary is kept.
+    """
+    summary = SheetSummary(sheet_name) if mode in ("summary", "auto") else None
+    buffered = []
+    overflowed = mode == "summary"
+
+    for row_num, row in enumerate(rows, 1):
+        if not any(cell is not None for cell in row):
+            continue
+        if summary is not None:
+            summary.add(row_num, row)
+        if overflowed:
+            continue
+
+        buffered.append(_format_row(row_num, row))
+        if mode == "auto" and len(buffered) > summary_rows:
+            buffered = []
+            overflowed = True
+        elif mode == "rows" and len(buffered) >= ROW_BATCH_SIZE:
+            yield "\n".join(buffered)
+            buffered = []
+
+    if overflowed:
+        yield summary.render()
+    elif buffered:
+        yield "\n".join(buffered)
+
+
+def iter_workbook_chunks(filepath: str, mode: str = None, summary_rows: int = None):
+    """
+    Streams an .xlsx workbook as citation-marked chunks using openpyxl's
+    read-only mode, so rows are never all loaded into memory at once.
+    """
+    mode = mode or SPREADSHEET_MODE
+    summary_rows = SPREADSHEET_SUMMARY_ROWS if summary_rows is None else summary_rows
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+            yield f"[START SHEET: {sheet_name}]"
+            yield from _iter_sheet(sheet_name, sheet.iter_rows(values_only=True), mode, summary_rows)
+            yield f"[END SHEET: {sheet_name}]"
+    finally:
+        workbook.close()
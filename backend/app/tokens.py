@@ -0,0 +1,104 @@
+import os
+import math
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# --- Configuration ---
+# Prompt token budgets per model. Both models have a 128k context window; the
+# defaults leave headroom for the completion. Override with TOKEN_BUDGET_<MODEL>,
+# e.g. TOKEN_BUDGET_GPT_4O_MINI=60000.
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("DEFAULT_TOKEN_BUDGET", 100000))
+MODEL_TOKEN_BUDGETS = {
+    "gpt-4o": int(os.environ.get("TOKEN_BUDGET_GPT_4O", 100000)),
+    "gpt-4o-mini": int(os.environ.get("TOKEN_BUDGET_GPT_4O_MINI", 100000)),
+}
+# Per-message framing tokens added by the chat format.
+MESSAGE_OVERHEAD_TOKENS = 4
+# Used when no tokenizer is available: ~4 characters per token for English text.
+CHARS_PER_TOKEN = 4
+
+_encoders = {}
+# One lock per model, so loading one model's encoding never blocks counts for another.
+_encoder_locks = {}
+_encoders_lock = threading.Lock()
+
+
+def _get_encoder(model: str):
+    """
+    Returns a tiktoken encoder for the model, or None when tiktoken (or its
+    encoding files, which are downloaded on first use) is unavailable.
+    Loaded encoders are returned without locking; the first load of a model
+    only holds that model's lock, never the shared one.
+    """
+    if tiktoken is None:
+        return None
+    if model in _encoders:
+        return _encoders[model]
+    
+    with _encoders_lock:
+        model_lock = _encoder_locks.setdefault(model, threading.Lock())
+    with model_lock:
+        if model not in _encoders:
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoder = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                print(f"Tokenizer unavailable for {model}, estimating token counts: {e}")
+                encoder = None
+            _encoders[model] = encoder
+        return _encoders[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Counts the tokens in text for the given model.
+    """
+    encoder = _get_encoder(model)
+    if encoder is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list[dict], model: str) -> int:
+    """
+    Counts the prompt tokens of a chat completion request.
+    """
+    return sum(count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS for message in messages) + 2
+
+
+def prompt_budget(model: str) -> int:
+    """
+    Returns the configured prompt token budget for a model.
+    """
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+def chunk_tokens(chunk: dict, model: str) -> int:
+    """
+    Returns a retrieval chunk's token count, memoised on the chunk itself
+    so that packing many sections over the same corpus counts each chunk once.
+    """
+    key = f"tokens:{model}"
+    if key not in chunk:
+        chunk[key] = count_tokens(chunk["text"], model)
+    return chunk[key]
+
+
+def pack_chunks(chunks: list[dict], max_tokens: int, model: str) -> list[dict]:
+    """
+    Greedily keeps chunks, in the order given (best first), while they fit in max_tokens.
+    Chunks that do not fit are skipped so smaller later ones can still be used.
+    """
+    packed = []
+    used = 0
+    for chunk in chunks:
+        size = chunk_tokens(chunk, model)
+        if used + size <= max_tokens:
+            packed.append(chunk)
+            used += size
+    return packed
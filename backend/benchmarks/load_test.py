@@ -0,0 +1,161 @@
+"""
+End-to-end load benchmark for the backend API.
+
+Drives /upload, /generate, /clarify and /export/pptx at a fixed concurrency
+and reports p50/p95/p99 latency, error counts and requests/sec per endpoint.
+Run the backend against benchmarks.mock_llm_server with LLM_CACHE_BACKEND=none,
+otherwise repeated prompts are answered from the response cache:
+
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000/api --concurrency 8 --requests 40 --output bench.json
+
+Without --file a synthetic text report is generated and uploaded.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+
+import httpx
+
+SCENARIOS = ("upload", "generate", "clarify", "export")
+DEFAULT_TEMPLATE = ["Executive Summary", "Financial Performance", "Risks", "Outlook"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of values (pct in 0-100); 0.0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def synthetic_report(paragraphs: int = 200) -> bytes:
+    lines = []
+    for i in range(paragraphs):
+        lines.append(
+            f"Section {i}: revenue in region {i % 7} grew {i % 13}% year on year, "
+            f"with operating margin at {10 + i % 9}% and headcount of {100 + i}."
+        )
+    return "\n\n".join(lines).encode("utf-8")
+
+
+def _summarise(name: str, results: list[tuple], elapsed: float) -> dict:
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "scenario": name,
+        "requests": len(results),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p95_s": round(percentile(latencies, 95), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "max_s": round(max(latencies), 4) if latencies else 0.0,
+    }
+
+
+async def _run_scenario(name: str, send, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one(position: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await send(position)
+                ok = response.status_code < 400
+                if not ok:
+                    print(f"{name} #{position}: HTTP {response.status_code} {response.text[:200]}")
+            except httpx.HTTPError as e:
+                ok = False
+                print(f"{name} #{position}: {type(e).__name__} {e}")
+            results.append((time.perf_counter() - started, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(position) for position in range(total)))
+    return _summarise(name, results, time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    if args.file:
+        uploads = [(os.path.basename(path), open(path, "rb").read()) for path in args.file]
+    else:
+        uploads = [("load_test_report.txt", synthetic_report())]
+    filenames = [name for name, _ in uploads]
+    template = args.template or DEFAULT_TEMPLATE
+
+    def request_body(position: int) -> dict:
+        # A per-request tone suffix keeps prompts distinct when --unique is set.
+        tone = f"professional {position}" if args.unique else "professional"
+        return {"template": template, "filenames": filenames, "tone": tone, "style": "analytical"}
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        # The other scenarios need the sources on the server.
+        response = await client.post("/upload", files=[("files", (name, data)) for name, data in uploads])
+        response.raise_for_status()
+
+        senders = {
+            "upload": lambda position: client.post("/upload", files=[("files", (name, data)) for name, data in uploads]),
+            "generate": lambda position: client.post("/generate", json=request_body(position)),
+            "clarify": lambda position: client.post("/clarify", json={"template": template, "filenames": filenames}),
+            "export": lambda position: client.post("/export/pptx", json=request_body(position)),
+        }
+        summaries = []
+        for name in args.scenarios:
+            print(f"Running {name}: {args.requests} requests at concurrency {args.concurrency}")
+            summaries.append(await _run_scenario(name, senders[name], args.requests, args.concurrency))
+
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "files": filenames,
+        "template": template,
+        "python": platform.python_version(),
+        "results": summaries,
+    }
+
+
+def print_table(report: dict) -> None:
+    header = f"{'scenario':<10} {'reqs':>5} {'errs':>5} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in report["results"]:
+        print(
+            f"{row['scenario']:<10} {row['requests']:>5} {row['errors']:>5} {row['requests_per_s']:>8.2f} "
+            f"{row['p50_s']:>8.3f} {row['p95_s']:>8.3f} {row['p99_s']:>8.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--file", action="append", help="source file to upload (repeatable)")
+    parser.add_argument("--template", nargs="+", help="section titles")
+    parser.add_argument("--unique", action="store_true", help="vary the tone per request to defeat response caching")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout in seconds")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
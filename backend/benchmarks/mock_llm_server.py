@@ -0,0 +1,151 @@
+"""
+OpenAI-compatible stand-in for load testing the backend without paying for tokens.
+
+Serves POST /v1/chat/completions with a configurable time to first token,
+generation speed and error rate, and plausible cited Markdown (or a JSON
+sections object for batched JSON-mode calls).
+
+    python -m benchmarks.mock_llm_server --port 9000 --latency 0.8 --tokens-per-second 60 --error-rate 0.02
+
+Then start the backend against it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=mock LLM_CACHE_BACKEND=none uvicorn app.main:app
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+# Overridden from the command line.
+SETTINGS = {
+    "latency": 0.5,
+    "jitter": 0.2,
+    "tokens_per_second": 50.0,
+    "completion_tokens": 300,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+}
+# Roughly one token per word of filler text.
+_FILLER = (
+    "Revenue grew steadily across the period while operating costs remained within plan "
+    "and the outlook for the coming quarters is cautiously positive"
+).split()
+_CITATION = re.compile(r"\[START DOCUMENT: ([^\]]+)\]")
+_SECTION_NUMBER = re.compile(r"^\s*(\d+)\. ", re.MULTILINE)
+
+app = FastAPI(title="Mock OpenAI API")
+_stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+
+def _markdown(completion_tokens: int, source: str) -> str:
+    lines = []
+    words = 0
+    while words < completion_tokens:
+        sentence = " ".join(random.choice(_FILLER) for _ in range(12))
+        lines.append(f"- {sentence.capitalize()}. [cite: {source}, page {len(lines) + 1}]")
+        words += 16
+    return "\n".join(lines)
+
+
+def _content(body: dict, completion_tokens: int) -> str:
+    prompt = "\n".join(message.get("content") or "" for message in body.get("messages", []))
+    match = _CITATION.search(prompt)
+    source = match.group(1) if match else "source.txt"
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        numbers = _SECTION_NUMBER.findall(prompt) or ["1"]
+        per_section = max(16, completion_tokens // len(numbers))
+        return json.dumps({"sections": {number: _markdown(per_section, source) for number in numbers}})
+    return _markdown(completion_tokens, source)
+
+
+def _error(status_code: int, message: str, error_type: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "code": None}},
+        headers=headers,
+    )
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    _stats["requests"] += 1
+
+    roll = random.random()
+    if roll < SETTINGS["rate_limit_rate"]:
+        _stats["rate_limited"] += 1
+        return _error(429, "Rate limit reached (mock)", "rate_limit_exceeded", {"retry-after": "1"})
+    if roll < SETTINGS["rate_limit_rate"] + SETTINGS["error_rate"]:
+        _stats["errors"] += 1
+        await asyncio.sleep(SETTINGS["latency"])
+        return _error(500, "Internal server error (mock)", "server_error")
+
+    completion_tokens = SETTINGS["completion_tokens"]
+    if body.get("max_tokens"):
+        completion_tokens = min(completion_tokens, int(body["max_tokens"]))
+    latency = max(0.0, SETTINGS["latency"] + random.uniform(-SETTINGS["jitter"], SETTINGS["jitter"]))
+    await asyncio.sleep(latency + completion_tokens / SETTINGS["tokens_per_second"])
+
+    content = _content(body, completion_tokens)
+    prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+    prompt_tokens = prompt_chars // 4
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": model, "object": "model"} for model in ("gpt-4o", "gpt-4o-mini")]}
+
+
+@app.get("/stats")
+async def stats():
+    return {**_stats, "settings": SETTINGS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=SETTINGS["latency"], help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=SETTINGS["jitter"], help="+/- seconds added to the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=SETTINGS["tokens_per_second"])
+    parser.add_argument("--completion-tokens", type=int, default=SETTINGS["completion_tokens"])
+    parser.add_argument("--error-rate", type=float, default=SETTINGS["error_rate"], help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=SETTINGS["rate_limit_rate"], help="fraction of requests answered with a 429")
+    args = parser.parse_args()
+
+    SETTINGS.update({
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "tokens_per_second": args.tokens_per_second,
+        "completion_tokens": args.completion_tokens,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Parser micro-benchmark: synthesizes PDF, DOCX, XLSX, PPTX and TXT documents
+at scaled sizes and measures the extraction path used by parse_document.
+
+For every file it reports the input size, parse time, throughput (MB/s and
+units/s, where a unit is a page, paragraph, row or slide), output size and
+peak RSS. Each parse runs in a fresh process so peak RSS belongs to that file
+alone. Large PDFs are sharded across the parse pool as in production; the
+worker processes' memory is not included in the parent's RSS.
+
+    python -m benchmarks.parser_bench --scales 1 10 50 --output parser_bench.json
+
+Compare two runs with --compare old.json.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import resource
+import multiprocessing
+import queue as queue_module
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMATS = ("pdf", "docx", "xlsx", "pptx", "txt")
+# Units per file at scale 1.
+BASE_UNITS = {"pdf": 10, "docx": 200, "xlsx": 1000, "pptx": 10, "txt": 500}
+XLSX_COLUMNS = 10
+UNIT_NAMES = {"pdf": "pages", "docx": "paragraphs", "xlsx": "rows", "pptx": "slides", "txt": "paragraphs"}
+# A parse that has not reported back within this many seconds is recorded as failed.
+MEASURE_TIMEOUT = 600
+
+_SENTENCE = (
+    "Revenue in the {region} region grew {growth}% year on year to ${revenue:,} while "
+    "operating margin reached {margin}% and customer retention held at {retention}%."
+)
+
+
+def _sentence(i: int) -> str:
+    return _SENTENCE.format(
+        region=("North", "South", "East", "West")[i % 4],
+        growth=i % 17,
+        revenue=1000000 + i * 7919,
+        margin=8 + i % 11,
+        retention=80 + i % 19,
+    )
+
+
+def _write_pdf(path: str, pages: int) -> None:
+    import fitz
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        text = "\n".join(_sentence(page_num * 40 + line) for line in range(40))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def _write_docx(path: str, paragraphs: int) -> None:
+    import docx
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(" ".join(_sentence(i * 3 + j) for j in range(3)))
+    document.save(path)
+
+
+def _write_xlsx(path: str, rows: int) -> None:
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    sheet.append([f"Column {c + 1}" for c in range(XLSX_COLUMNS - 2)] + ["Region", "Date"])
+    for r in range(rows):
+        sheet.append([r * c + 0.5 for c in range(XLSX_COLUMNS - 2)] + [("North", "South")[r % 2], f"2024-{r % 12 + 1:02d}-01"])
+    workbook.save(path)
+
+
+def _write_pptx(path: str, slides: int) -> None:
+    from pptx import Presentation
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Quarterly update {i + 1}"
+        body = slide.placeholders[1].text_frame
+        body.text = _sentence(i * 5)
+        for j in range(1, 5):
+            body.add_paragraph().text = _sentence(i * 5 + j)
+    presentation.save(path)
+
+
+def _write_txt(path: str, paragraphs: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(" ".join(_sentence(i * 3 + j) for j in range(3)) for i in range(paragraphs)))
+
+
+WRITERS = {"pdf": _write_pdf, "docx": _write_docx, "xlsx": _write_xlsx, "pptx": _write_pptx, "txt": _write_txt}
+
+
+def build_corpus(upload_directory: str, formats: list[str], scales: list[int]) -> list[dict]:
+    """
+    Writes one document per format and scale into upload_directory.
+    """
+    corpus = []
+    for fmt in formats:
+        for scale in scales:
+            units = BASE_UNITS[fmt] * scale
+            filename = f"bench_{fmt}_x{scale}.{fmt}"
+            path = os.path.join(upload_directory, filename)
+            WRITERS[fmt](path, units)
+            corpus.append({"format": fmt, "scale": scale, "filename": filename, "units": units, "bytes": os.path.getsize(path)})
+    return corpus
+
+
+def _measure(work_directory: str, filename: str, queue) -> None:
+    """
+    Child-process entry point: imports the backend inside the scratch
+    directory and streams one file through services.iter_document_chunks.
+    """
+    sys.path.insert(0, BACKEND_DIRECTORY)
+    os.chdir(work_directory)
+    # Importing services builds the OpenAI client; parsing never calls it.
+    os.environ.setdefault("OPENAI_API_KEY", "parser-bench")
+    from app import services
+
+    filepath = os.path.join(services.UPLOAD_DIRECTORY, filename)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    output_chars = 0
+    chunks = 0
+    try:
+        for chunk in services.iter_document_chunks(filename, filepath):
+            output_chars += len(chunk) + 1
+            chunks += 1
+        error = None
+    except Exception as e:
+        error = str(e)
+    seconds = time.perf_counter() - started
+    queue.put({
+        "seconds": seconds,
+        "output_chars": max(0, output_chars - 1),
+        "chunks": chunks,
+        "baseline_rss_bytes": baseline_kb * 1024,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "error": error,
+    })
+
+
+def _collect(process, queue, timeout: float) -> dict:
+    """
+    Waits for a measurement. A child that dies or hangs before reporting back
+    is recorded as a failed run instead of blocking the benchmark.
+    """
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None and time.monotonic() < deadline:
+        try:
+            result = queue.get(timeout=1)
+        except queue_module.Empty:
+            if not process.is_alive():
+                try:
+                    result = queue.get_nowait()
+                except queue_module.Empty:
+                    break
+    process.join(timeout=5)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    if result is not None:
+        return result
+    reason = f"exit code {process.exitcode}" if process.exitcode else f"no result within {timeout}s"
+    return {"seconds": None, "error": f"parser process failed: {reason}"}
+
+
+def run(args) -> dict:
+    work_directory = tempfile.mkdtemp(prefix="parser_bench_")
+    upload_directory = os.path.join(work_directory, "uploads")
+    os.makedirs(upload_directory)
+    try:
+        print(f"Building corpus in {work_directory}")
+        corpus = build_corpus(upload_directory, args.formats, args.scales)
+        context = multiprocessing.get_context("spawn")
+        results = []
+        for entry in corpus:
+            runs = []
+            for _ in range(args.repeat):
+                queue = context.Queue()
+                process = context.Process(target=_measure, args=(work_directory, entry["filename"], queue))
+                process.start()
+                runs.append(_collect(process, queue, args.timeout))
+            completed = [run for run in runs if run["seconds"] is not None]
+            if not completed:
+                result = {**entry, "unit": UNIT_NAMES[entry["format"]], "seconds": None, "error": runs[0]["error"]}
+                results.append(result)
+                print(f"{result['filename']:<22} {result['bytes'] / 1024:>9.0f} KB failed: {result['error']}")
+                continue
+            best = min(completed, key=lambda run: run["seconds"])
+            seconds = best["seconds"] or 1e-9
+            result = {
+                **entry,
+                "unit": UNIT_NAMES[entry["format"]],
+                "seconds": round(seconds, 4),
+                "mb_per_s": round(entry["bytes"] / (1024 * 1024) / seconds, 3),
+                "units_per_s": round(entry["units"] / seconds, 1),
+                "output_chars": best["output_chars"],
+                "chunks": best["chunks"],
+                "peak_rss_mb": round(best["peak_rss_bytes"] / (1024 * 1024), 1),
+                "rss_growth_mb": round((best["peak_rss_bytes"] - best["baseline_rss_bytes"]) / (1024 * 1024), 1),
+                "error": best["error"],
+            }
+            results.append(result)
+            print(
+                f"{result['filename']:<22} {result['bytes'] / 1024:>9.0f} KB {result['seconds']:>8.3f} s "
+                f"{result['mb_per_s']:>8.2f} MB/s {result['units_per_s']:>10.1f} {result['unit']}/s "
+                f"rss {result['peak_rss_mb']:>7.1f} MB (+{result['rss_growth_mb']})"
+            )
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parse_workers": os.environ.get("PARSE_WORKERS"),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline_path: str) -> None:
+    """
+    Prints the throughput change of each file against an earlier report.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {row["filename"]: row for row in json.load(f)["results"]}
+    print(f"Compared with {baseline_path}:")
+    for row in report["results"]:
+        previous = baseline.get(row["filename"])
+        if previous and previous["seconds"] and row["seconds"] is not None:
+            change = (previous["seconds"] - row["seconds"]) / previous["seconds"] * 100
+            print(f"{row['filename']:<22} {previous['seconds']:>8.3f} s -> {row['seconds']:>8.3f} s ({change:+.1f}% faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 50], help="multipliers of the base document sizes")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per file; the fastest is reported")
+    parser.add_argument("--timeout", type=float, default=MEASURE_TIMEOUT, help="seconds to wait for each parse")
+    parser.add_argument("--output", default=f"parser_bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,13 @@ function App() {
   const [template, setTemplate] = useState(['Executive Summary', 'Key Findings', 'Conclusion']);
   const [uploadedFiles, setUploadedFiles] = useState([]);
   const [generatedDocument, setGeneratedDocument] = useState('');
+  const [documentId, setDocumentId] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
+  // Sections completed so far while a report streams in: { completed, total }
+  const [progress, setProgress] = useState(null);
   const [error, setError] = useState('');
+  // Shown above the report, e.g. when some sections hold placeholder text
+  const [warning, setWarning] = useState('');
   
   // New state for enhanced features
   const [tone, setTone] = useState('professional');
@@ -34,6 +39,74 @@ function App() {
     }
   };
 
+  // Stored documents do not survive a backend restart or redeploy. Returns null
+  // (and forgets the stale ID) when the document is gone, so callers can fall back.
+  const postForStoredDocument = async (path, body) => {
+    try {
+      return await axios.post(`${API_BASE_URL}${path}`, body);
+    } catch (err) {
+      if (err.response?.status !== 404) {
+        throw err;
+      }
+      setDocumentId(null);
+      return null;
+    }
+  };
+
+  // Same layout as the backend's assemble_document, so the preview does not
+  // jump when the final document replaces the streamed sections.
+  const assembleSections = (sections) => sections
+    .filter(Boolean)
+    .map(section => `## ${section.title}\n\n${section.content}\n\n---\n`)
+    .join('\n');
+
+  // Generates a new report over /generate/stream, rendering each section in the
+  // preview as soon as it arrives. Resolves with the 'done' event's data.
+  const streamGeneration = async (request) => {
+    const response = await fetch(`${API_BASE_URL}/generate/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(request)
+    });
+    if (!response.ok || !response.body) {
+      const err = new Error(`Streaming generation failed with status ${response.status}`);
+      err.response = { status: response.status };
+      throw err;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const sections = [];
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const raw of events) {
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'start') {
+          setProgress({ completed: 0, total: data.total });
+        } else if (event === 'section') {
+          sections[data.index] = data;
+          setGeneratedDocument(assembleSections(sections));
+          setProgress({ completed: sections.filter(Boolean).length, total: request.template.length });
+        } else if (event === 'done') {
+          return data;
+        } else if (event === 'error') {
+          const err = new Error(data.detail);
+          err.response = { status: data.status || 500 };
+          throw err;
+        }
+      }
+    }
+    throw new Error('The generation stream ended before the report was complete.');
+  };
+
   const handleGenerate = async () => {
     if (uploadedFiles.length === 0) {
       setError('Please upload at least one source document.');
@@ -46,21 +119,42 @@ function App() {
 
     setIsLoading(true);
     setError('');
-    setGeneratedDocument('');
+    setWarning('');
 
+    const request = {
+      template: template,
+      filenames: uploadedFiles.map(f => f.name),
+      tone: tone,
+      style: style
+    };
     try {
-      const response = await axios.post(`${API_BASE_URL}/generate`, {
-        template: template,
-        filenames: uploadedFiles.map(f => f.name),
-        tone: tone,
-        style: style
-      });
-      setGeneratedDocument(response.data.document);
+      // Once a report exists, only the sections affected by the edits are regenerated.
+      const response = documentId ? await postForStoredDocument(`/documents/${documentId}/regenerate`, request) : null;
+      let demoSections;
+      if (response) {
+        setGeneratedDocument(response.data.document);
+        setDocumentId(response.data.document_id);
+        demoSections = (response.data.usage || []).filter(section => section.demo_fallback).map(section => section.title);
+      } else {
+        // A new report streams in section by section.
+        setGeneratedDocument('');
+        const result = await streamGeneration(request);
+        setGeneratedDocument(result.document);
+        setDocumentId(result.document_id);
+        demoSections = (result.demo_sections || []).map(index => template[index]);
+      }
+      if (demoSections.length > 0) {
+        setWarning(`The AI service failed for ${demoSections.length} section(s); they contain placeholder text: ${demoSections.join(', ')}.`);
+      }
     } catch (err) {
       console.error("Generation failed:", err);
-      setError('Failed to generate the document. Please check the backend server.');
+      setGeneratedDocument('');
+      setError(err.response?.status === 503
+        ? 'The AI service is unavailable, so no report was generated. Please try again later.'
+        : 'Failed to generate the document. Please check the backend server.');
     } finally {
       setIsLoading(false);
+      setProgress(null);
     }
   };
 
@@ -92,9 +186,11 @@ function App() {
     }
   };
 
-  const handleExportPPTX = async () => {
+  const EXPORT_LABELS = { pptx: 'PowerPoint', docx: 'Word', pdf: 'PDF' };
+
+  const handleExport = async (format) => {
     if (!generatedDocument) {
-      setError('Please generate a document first before exporting to PowerPoint.');
+      setError(`Please generate a document first before exporting to ${EXPORT_LABELS[format]}.`);
       return;
     }
 
@@ -102,12 +198,11 @@ function App() {
     setError('');
 
     try {
-      const response = await axios.post(`${API_BASE_URL}/export/pptx`, {
-        template: template,
-        filenames: uploadedFiles.map(f => f.name),
-        tone: tone,
-        style: style
-      });
+      // Export the document already on screen instead of regenerating it
+      let response = documentId ? await postForStoredDocument('/export', { document_id: documentId, formats: [format] }) : null;
+      if (!response) {
+        response = await axios.post(`${API_BASE_URL}/export`, { document: generatedDocument, formats: [format] });
+      }
       
       // Trigger download
       const downloadUrl = response.data.download_url;
@@ -121,13 +216,15 @@ function App() {
       // Refresh files list
       loadFilesList();
     } catch (err) {
-      console.error("PowerPoint export failed:", err);
-      setError('Failed to export to PowerPoint.');
+      console.error(`${EXPORT_LABELS[format]} export failed:`, err);
+      setError(`Failed to export to ${EXPORT_LABELS[format]}.`);
     } finally {
       setIsLoading(false);
     }
   };
 
+  const handleExportPPTX = () => handleExport('pptx');
+
   const handleDeleteFile = async (filename) => {
     try {
       await axios.delete(`${API_BASE_URL}/files/${filename}`);
@@ -170,8 +267,10 @@ function App() {
       <PreviewPanel
         document={generatedDocument}
         isLoading={isLoading}
+        progress={progress}
         error={error}
-        onExportPPTX={handleExportPPTX}
+        warning={warning}
+        onExport={handleExport}
         tone={tone}
         style={style}
       />
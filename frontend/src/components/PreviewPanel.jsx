@@ -1,114 +1,8 @@
 import React from 'react';
 import ReactMarkdown from 'react-markdown';
-import jsPDF from 'jspdf';
-import { Document, Packer, Paragraph, HeadingLevel, TextRun } from 'docx';
-import { saveAs } from 'file-saver';
-
-const PreviewPanel = ({ document, isLoading, error, onExportPPTX, tone, style }) => {
-  // Export to PDF function with enhanced formatting
-  const exportToPDF = () => {
-    const pdf = new jsPDF();
-    
-    // Add title page
-    pdf.setFontSize(24);
-    pdf.text('Generated Report', 20, 30);
-    
-    pdf.setFontSize(12);
-    pdf.text(`Tone: ${tone} | Style: ${style}`, 20, 45);
-    pdf.text(`Generated on: ${new Date().toLocaleDateString()}`, 20, 55);
-    
-    // Clean content for PDF (remove markdown formatting)
-    const cleanContent = document
-      .replace(/## (.*)/g, '$1')
-      .replace(/\*\*(.*?)\*\*/g, '$1')
-      .replace(/\[cite:.*?\]/g, '')
-      .replace(/---/g, '')
-      .replace(/\*/g, '•');
-    
-    const lines = pdf.splitTextToSize(cleanContent, 170);
-    pdf.setFontSize(10);
-    pdf.text(lines, 20, 70);
-    
-    pdf.save(`generated-report-${tone}-${style}.pdf`);
-  };
-
-  // Export to DOCX function with enhanced formatting
-  const exportToDOCX = async () => {
-    const sections = document.split('## ').filter(section => section.trim());
-    const docElements = [];
-
-    // Add title
-    docElements.push(
-      new Paragraph({
-        children: [new TextRun({ text: "Generated Report", bold: true, size: 32 })],
-        heading: HeadingLevel.TITLE,
-        spacing: { before: 0, after: 400 }
-      })
-    );
-
-    // Add metadata
-    docElements.push(
-      new Paragraph({
-        children: [
-          new TextRun({ text: `Tone: ${tone} | Style: ${style}`, italics: true, size: 20 }),
-          new TextRun({ text: `\nGenerated on: ${new Date().toLocaleDateString()}`, italics: true, size: 20 })
-        ],
-        spacing: { before: 200, after: 400 }
-      })
-    );
-
-    sections.forEach(section => {
-      const lines = section.split('\n');
-      const title = lines[0];
-      const content = lines.slice(1).join('\n');
-
-      if (title) {
-        docElements.push(
-          new Paragraph({
-            children: [new TextRun({ text: title, bold: true, size: 28 })],
-            heading: HeadingLevel.HEADING_1,
-            spacing: { before: 400, after: 200 }
-          })
-        );
-      }
-
-      const cleanContent = content
-        .replace(/\*\*(.*?)\*\*/g, '$1')
-        .replace(/\[cite:.*?\]/g, '')
-        .replace(/---/g, '')
-        .split('\n')
-        .filter(line => line.trim());
-
-      cleanContent.forEach(line => {
-        if (line.trim()) {
-          // Detect if line is a citation
-          const isCitation = line.includes('[Source:');
-          
-          docElements.push(
-            new Paragraph({
-              children: [new TextRun({ 
-                text: line.trim(), 
-                italics: isCitation,
-                size: isCitation ? 16 : 20
-              })],
-              spacing: { after: 200 }
-            })
-          );
-        }
-      });
-    });
-
-    const doc = new Document({
-      sections: [{
-        properties: {},
-        children: docElements
-      }]
-    });
-
-    const blob = await Packer.toBlob(doc);
-    saveAs(blob, `generated-report-${tone}-${style}.docx`);
-  };
 
+const PreviewPanel = ({ document, isLoading, progress, error, warning, onExport, tone, style }) => {
+  // PDF, Word and PowerPoint files are rendered on the server
   // Enhanced markdown renderer with custom components
   const components = {
     h2: ({ children }) => (
@@ -186,21 +80,21 @@ const PreviewPanel = ({ document, isLoading, error, onExportPPTX, tone, style })
           
           <div className="flex space-x-2">
             <button
-              onClick={exportToPDF}
+              onClick={() => onExport('pdf')}
               disabled={!document || isLoading}
               className="flex items-center px-4 py-2 bg-red-600 text-white rounded-md hover:bg-red-700 disabled:bg-gray-400 text-sm"
             >
               📄 Export PDF
             </button>
             <button
-              onClick={exportToDOCX}
+              onClick={() => onExport('docx')}
               disabled={!document || isLoading}
               className="flex items-center px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:bg-gray-400 text-sm"
             >
               📝 Export Word
             </button>
             <button
-              onClick={onExportPPTX}
+              onClick={() => onExport('pptx')}
               disabled={!document || isLoading}
               className="flex items-center px-4 py-2 bg-orange-600 text-white rounded-md hover:bg-orange-700 disabled:bg-gray-400 text-sm"
             >
@@ -212,11 +106,14 @@ const PreviewPanel = ({ document, isLoading, error, onExportPPTX, tone, style })
 
       {/* Content area */}
       <div className="flex-1 overflow-auto">
-        {isLoading ? (
+        {isLoading && !document ? (
           <div className="flex items-center justify-center h-full">
             <div className="text-center">
               <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-indigo-600 mx-auto mb-4"></div>
               <p className="text-gray-600">Generating your document...</p>
+              {progress && (
+                <p className="text-sm text-gray-500 mt-2">{progress.completed} of {progress.total} sections ready</p>
+              )}
               <p className="text-sm text-gray-500 mt-2">This may take a few moments</p>
             </div>
           </div>
@@ -233,6 +130,19 @@ const PreviewPanel = ({ document, isLoading, error, onExportPPTX, tone, style })
           </div>
         ) : document ? (
           <div className="p-8">
+            {/* Streaming progress: sections appear as soon as they are generated */}
+            {isLoading && (
+              <div className="mb-4 flex items-center text-sm text-indigo-700">
+                <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-indigo-600 mr-2"></div>
+                {progress ? `Generating... ${progress.completed} of ${progress.total} sections ready` : 'Updating...'}
+              </div>
+            )}
+            {warning && (
+              <div className="mb-4 p-4 bg-yellow-50 border border-yellow-300 rounded-lg text-sm text-yellow-800">
+                ⚠️ {warning}
+              </div>
+            )}
+
             {/* Document metadata */}
             <div className="mb-6 p-4 bg-gray-50 rounded-lg border">
               <div className="flex items-center justify-between text-sm text-gray-600">